@@ -1,30 +1,63 @@
-import pandas as pd
-
-# AQI breakpoints for PM2.5
-def pm25_to_aqi(pm25):
-    if pm25 <= 12.0:
-        return 0  # Good
-    elif pm25 <= 35.4:
-        return 1  # Moderate
-    elif pm25 <= 55.4:
-        return 2  # Unhealthy for Sensitive
-    elif pm25 <= 150.4:
-        return 3  # Unhealthy
-    elif pm25 <= 250.4:
-        return 4  # Very Unhealthy
-    else:
-        return 5  # Hazardous
+# AQIFunction.py
+# Label PRSA station files with EPA AQI values and classes for training the sensor models.
+#
+#   python AQIFunction.py                                     # the Wanshouxigong file -> processed_sensor_dataset.csv
+#   python AQIFunction.py "C:\...\dataset\PRSA_Data_*.csv"    # every station, labeled in parallel, then combined
+#   python AQIFunction.py data.csv --pollutants PM2.5 PM10 NO2 CO O3 SO2 --class-from overall
+#
+# Files are streamed in chunks (memory stays flat whatever their size) and the
+# breakpoint search is vectorized, see aqi_labels.py.
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aqi_labels import POLLUTANTS, combine, label_file, label_files  # noqa: E402
 
-# Load your dataset
-df = pd.read_csv(r"C:\Users\kartik\Desktop\Envira 2.0\dataset\PRSA_Data_Wanshouxigong_20130301-20170228.csv")
+# -------- SETTINGS -------- #
+DEFAULT_INPUT = r"C:\Users\kartik\Desktop\Envira 2.0\dataset\PRSA_Data_Wanshouxigong_20130301-20170228.csv"
+DEFAULT_OUT = "processed_sensor_dataset.csv"
+DEFAULT_KEEP = ("PM2.5", "TEMP")   # the sensor model's features
 
-# Keep only needed columns
-df = df[["PM2.5", "TEMP"]].copy()
 
-# Create AQI_Class column
-df["AQI_Class"] = df["PM2.5"].apply(pm25_to_aqi)
+# -------- MAIN -------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label PRSA CSVs with EPA AQI values and AQI_Class")
+    parser.add_argument("inputs", nargs="*", default=[DEFAULT_INPUT], help="CSV files or glob patterns")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="labeled CSV (all inputs combined)")
+    parser.add_argument("--out-dir", default="labeled", help="per-file outputs when there are several inputs")
+    parser.add_argument("--pollutants", nargs="+", choices=list(POLLUTANTS), default=["PM2.5"])
+    parser.add_argument("--keep", nargs="+", default=list(DEFAULT_KEEP), help="input columns copied to the output")
+    parser.add_argument("--class-from", default="PM2.5", help="pollutant whose sub-index gives AQI_Class, or 'overall'")
+    parser.add_argument("--chunksize", type=int, default=200000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="parallel files (default: CPU count)")
+    parser.add_argument("--keep-na", action="store_true", help="keep rows without a value (AQI_Class -1)")
+    args = parser.parse_args()
 
-# Save processed dataset
-df.to_csv("processed_sensor_dataset.csv", index=False)
+    if args.class_from != "overall" and args.class_from not in args.pollutants:
+        parser.error(f"--class-from {args.class_from} is not one of --pollutants")
+    paths = sorted({p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])})
+    options = {
+        "pollutants": tuple(args.pollutants),
+        "keep": tuple(args.keep),
+        "class_from": args.class_from,
+        "chunksize": args.chunksize,
+        "dropna": not args.keep_na,
+    }
+
+    start = time.perf_counter()
+    if len(paths) == 1:
+        results = [label_file(paths[0], args.out, **options)]
+    else:
+        results = label_files(paths, args.out_dir, workers=args.workers, **options)
+        combine([r["output"] for r in results], args.out)
 
-print(df.head())
+    for r in results:
+        print(f"{os.path.basename(r['file'])}: {r['labeled']}/{r['rows']} rows labeled in {r['seconds']} s")
+    total = sum(r["labeled"] for r in results)
+    print(f"\n{total} rows from {len(paths)} file(s) -> {args.out} in {time.perf_counter() - start:.2f} s")
+    for name in results[0]["classes"]:
+        print(f"  {name:<32}{sum(r['classes'][name] for r in results):>10}")
@@ -0,0 +1,122 @@
+# aqiGrid.py
+# Export the sensor AQI forests as a lookup grid over PM2.5 x TEMP and report its error.
+#
+#   python aqiGrid.py                                         # aqi_grid.npy next to this script
+#   python aqiGrid.py --pm25 0 600 0.1 --temp -20 45 1 --mode linear
+#   set SENSOR_MODEL_GRID=C:\...\Models\aqi_grid.npy          # the server then serves the grid
+#
+# The grid (AQI + class probabilities per point, float32) is saved as .npy so it
+# can be memory-mapped; axes, mode and the measured error go to <out>.json.
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_model import AQI_CLASSES, GRID_MODES, GridAQIModel, load_sensor_model  # noqa: E402
+
+# -------- SETTINGS -------- #
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aqi_grid.npy")
+DEFAULT_PM25 = (0.0, 500.0, 0.25)   # start, stop, step (µg/m³)
+DEFAULT_TEMP = (-20.0, 45.0, 0.5)   # start, stop, step (°C)
+
+
+# -------- EXPORT -------- #
+def axis(start, stop, step):
+    count = int(round((stop - start) / step)) + 1
+    if count < 2:
+        raise SystemExit(f"Axis {start}..{stop} step {step} needs at least two points")
+    return [start, step, count]
+
+
+def export_values(model, pm25_axis, temp_axis):
+    pm25 = pm25_axis[0] + pm25_axis[1] * np.arange(pm25_axis[2])
+    temp = temp_axis[0] + temp_axis[1] * np.arange(temp_axis[2])
+    points = np.column_stack([np.repeat(pm25, len(temp)), np.tile(temp, len(pm25))])
+    out = model.predict_batch(points)
+    values = np.column_stack([out["aqi"], out["probabilities"]]).astype(np.float32)
+    return values.reshape(len(pm25), len(temp), 1 + len(AQI_CLASSES))
+
+
+def save(path, values, meta):
+    # Write to temporaries first so a running server never maps a half-written grid
+    np.save(path + ".tmp.npy", values)
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp.npy", path)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+# -------- MEASUREMENTS -------- #
+def measure_error(model, grid, test_points):
+    reference = model.predict_batch(test_points)
+    out = grid.predict_batch(test_points)
+    aqi_error = np.abs(out["aqi"] - reference["aqi"])
+    return {
+        "aqi_max_abs": round(float(aqi_error.max()), 4),
+        "aqi_mean_abs": round(float(aqi_error.mean()), 4),
+        "aqi_p99_abs": round(float(np.percentile(aqi_error, 99)), 4),
+        "class_agreement": round(float((out["predicted_class"] == reference["predicted_class"]).mean()), 6),
+        "prob_max_abs": round(float(np.abs(out["probabilities"] - reference["probabilities"]).max()), 4),
+    }
+
+
+def rows_per_s(fn, X):
+    fn(X[:100])  # warm-up
+    start = time.perf_counter()
+    fn(X)
+    return len(X) / (time.perf_counter() - start)
+
+
+# -------- MAIN -------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the sensor AQI forests as a PM2.5 x TEMP lookup grid")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="grid file (.npy); metadata goes to <out>.json")
+    parser.add_argument("--pm25", nargs=3, type=float, default=DEFAULT_PM25, metavar=("START", "STOP", "STEP"))
+    parser.add_argument("--temp", nargs=3, type=float, default=DEFAULT_TEMP, metavar=("START", "STOP", "STEP"))
+    parser.add_argument("--mode", choices=GRID_MODES, default="nearest", help="lookup served by default")
+    parser.add_argument("--test-points", type=int, default=200000, help="random points used to measure the error")
+    args = parser.parse_args()
+
+    model = load_sensor_model(grid_path="")
+    pm25_axis, temp_axis = axis(*args.pm25), axis(*args.temp)
+    print(f"Grid: PM2.5 {pm25_axis[2]} x TEMP {temp_axis[2]} points, class probabilities from "
+          f"{'the classifier' if model.classifier is not None else 'tree votes'}")
+
+    start = time.perf_counter()
+    values = export_values(model, pm25_axis, temp_axis)
+    print(f"Evaluated the forests in {time.perf_counter() - start:.1f} s ({values.nbytes / 1e6:.1f} MB)")
+
+    meta = {
+        "pm25": pm25_axis,
+        "temp": temp_axis,
+        "classes": AQI_CLASSES,
+        "class_source": "votes" if model.classifier is None else "classifier",
+        "mode": args.mode,
+        "error": {},
+    }
+
+    # Error against the forests at random points inside the grid (not just on it)
+    rng = np.random.default_rng(0)
+    test_points = np.column_stack([
+        rng.uniform(args.pm25[0], args.pm25[1], args.test_points),
+        rng.uniform(args.temp[0], args.temp[1], args.test_points),
+    ])
+    forest_rate = rows_per_s(model.predict_batch, test_points[:20000])
+    print(f"\n{'mode':<10}{'max |dAQI|':>12}{'mean |dAQI|':>13}{'p99 |dAQI|':>12}{'class agree':>13}"
+          f"{'max |dprob|':>13}{'rows/s':>14}")
+    for mode in GRID_MODES:
+        grid = GridAQIModel(values, meta, mode)
+        error = measure_error(model, grid, test_points)
+        meta["error"][mode] = error
+        rate = rows_per_s(grid.predict_batch, test_points)
+        print(f"{mode:<10}{error['aqi_max_abs']:>12.3f}{error['aqi_mean_abs']:>13.4f}{error['aqi_p99_abs']:>12.3f}"
+              f"{error['class_agreement']:>13.4%}{error['prob_max_abs']:>13.3f}{rate:>14,.0f}")
+    print(f"{'forests':<10}{'':>63}{forest_rate:>14,.0f}")
+
+    save(args.out, values, meta)
+    print(f"\nSaved {args.out} (+ .json), served with mode '{args.mode}'")
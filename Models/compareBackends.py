@@ -0,0 +1,130 @@
+# compare_backends.py
+# Accuracy drift and latency/throughput of every inference backend vs the fp32 checkpoint.
+#
+#   python compareBackends.py --images "C:\...\GAN Data\All_img"
+#   python compareBackends.py --images DIR --backends eager onnx int8-static --json results.json
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backends import BACKENDS, IMAGE_EXTENSIONS, build_backend  # noqa: E402
+from vision_model import TRANSFORM, load_model  # noqa: E402
+
+# -------- SETTINGS -------- #
+DEFAULT_IMAGES = r"C:\Users\kartik\Desktop\Envira 2.0\GAN Data\All_img"
+CLASS_DIRS = ["Good", "Moderate", "Severe", "Unhealthy_for_seneitive_groups", "Unhealthy", "Very_Unhealthy"]
+
+
+# -------- DATA -------- #
+def load_samples(images_dir, limit, seed=0):
+    paths = [
+        p for p in glob.glob(os.path.join(images_dir, "**", "*"), recursive=True)
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    random.Random(seed).shuffle(paths)
+    paths = paths[:limit]
+
+    tensors, labels = [], []
+    for p in paths:
+        tensors.append(TRANSFORM(Image.open(p).convert("RGB")))
+        # ImageFolder layout: the parent folder is the label, when it matches a class
+        folder = os.path.basename(os.path.dirname(p))
+        labels.append(CLASS_DIRS.index(folder) if folder in CLASS_DIRS else -1)
+    return torch.stack(tensors), torch.tensor(labels)
+
+
+def run_all(fn, inputs, batch_size):
+    outputs = [fn(inputs[i:i + batch_size]) for i in range(0, len(inputs), batch_size)]
+    return torch.cat(outputs).float().cpu()
+
+
+# -------- MEASUREMENTS -------- #
+def latency_ms(fn, example, repeat):
+    for _ in range(3):
+        fn(example)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(example)
+        times.append((time.perf_counter() - start) * 1000.0)
+    times.sort()
+    return statistics.median(times), times[int(0.95 * (len(times) - 1))]
+
+
+def throughput(fn, inputs, batch_size):
+    run_all(fn, inputs[:batch_size], batch_size)  # warm-up
+    start = time.perf_counter()
+    run_all(fn, inputs, batch_size)
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def compare(name, backend, reference_logits, inputs, labels, batch_size, repeat):
+    logits = run_all(backend, inputs, batch_size)
+    ref_probs = torch.softmax(reference_logits, dim=1)
+    probs = torch.softmax(logits, dim=1)
+    preds = logits.argmax(1)
+
+    labelled = labels >= 0
+    p50, p95 = latency_ms(backend, inputs[:1], repeat)
+    return {
+        "backend": name,
+        "top1_agreement": float((preds == reference_logits.argmax(1)).float().mean()),
+        "max_logit_diff": float((logits - reference_logits).abs().max()),
+        "max_prob_diff": float((probs - ref_probs).abs().max()),
+        "accuracy": float((preds[labelled] == labels[labelled]).float().mean()) if labelled.any() else None,
+        "latency_b1_p50_ms": round(p50, 3),
+        "latency_b1_p95_ms": round(p95, 3),
+        "throughput_img_s": round(throughput(backend, inputs, batch_size), 1),
+    }
+
+
+# -------- MAIN -------- #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends against the fp32 checkpoint")
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="ImageFolder root used for drift + calibration")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--samples", type=int, default=256, help="images used to measure drift and throughput")
+    parser.add_argument("--calibration-samples", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=50, help="batch-1 latency repetitions")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    fp32 = load_model().to("cpu").eval()
+    inputs, labels = load_samples(args.images, args.samples)
+    print(f"Loaded {len(inputs)} images from {args.images}")
+    reference_logits = run_all(fp32, inputs, args.batch_size)
+
+    results = []
+    for name in args.backends:
+        try:
+            backend = build_backend(
+                name, fp32, calibration_dir=args.images, calibration_samples=args.calibration_samples
+            )
+        except Exception as e:
+            print(f"{name}: unavailable ({e})")
+            continue
+        results.append(compare(name, backend, reference_logits, inputs, labels, args.batch_size, args.repeat))
+
+    print(f"\n{'backend':<14}{'top1 agree':>11}{'max dlogit':>11}{'max dprob':>10}{'accuracy':>10}"
+          f"{'b1 p50':>10}{'b1 p95':>10}{'img/s':>9}")
+    for r in results:
+        acc = f"{r['accuracy']:.4f}" if r["accuracy"] is not None else "n/a"
+        print(f"{r['backend']:<14}{r['top1_agreement']:>11.4f}{r['max_logit_diff']:>11.4f}{r['max_prob_diff']:>10.4f}"
+              f"{acc:>10}{r['latency_b1_p50_ms']:>8.2f}ms{r['latency_b1_p95_ms']:>8.2f}ms{r['throughput_img_s']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"samples": len(inputs), "batch_size": args.batch_size, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
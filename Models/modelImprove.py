@@ -195,7 +195,9 @@ for epoch in range(1, total_epochs + 1):
     # Save best
     if val_acc > best_val_acc:
         best_val_acc = val_acc
-        torch.save(model.state_dict(), checkpoint_path)
+        # Write then rename, so a running server never sees a half-written checkpoint
+        torch.save(model.state_dict(), checkpoint_path + ".tmp")
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
         print(f"Model improved — saved to {checkpoint_path} (Val Acc: {best_val_acc:.4f})")
     else:
         print("No improvement this epoch.")
@@ -1,13 +1,21 @@
+import os
+import sys
+
 import torch
 import torch.nn as nn
 import torchvision.models as models
 import torchvision.transforms as transforms
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference_backends import build_backend  # noqa: E402
+
 # -------- SETTINGS -------- #
 MODEL_PATH = r"C:\Users\kartik\Desktop\Envira 2.0\Models\best_resnet18.pth"
 CLASS_NAMES = ["Good", "Moderate", "Severe", "Unhealthy_for_seneitive_groups", "Unhealthy", "Very_Unhealthy"]  # adjust to your dataset
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")  # eager | torchscript | onnx | int8-dynamic | int8-static
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", r"C:\Users\kartik\Desktop\Envira 2.0\GAN Data\All_img")  # only used by int8-static
 
 # -------- LOAD MODEL -------- #
 model = models.resnet18(weights=None)  # do NOT use pretrained here
@@ -25,6 +33,9 @@ model.load_state_dict(state_dict)
 model = model.to(DEVICE)
 model.eval()
 
+# Swap in the optimized backend (compare them with compareBackends.py)
+model = build_backend(BACKEND, model, calibration_dir=CALIBRATION_DIR)
+
 # -------- TRANSFORMS -------- #
 transform = transforms.Compose([
     transforms.Resize((224, 224)),   # match training
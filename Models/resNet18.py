@@ -123,7 +123,9 @@ for epoch in range(num_epochs):
     # Save best model
     if val_acc > best_val_acc:
         best_val_acc = val_acc
-        torch.save(model.state_dict(), "best_resnet18.pth")
+        # Write then rename, so a running server never sees a half-written checkpoint
+        torch.save(model.state_dict(), "best_resnet18.pth.tmp")
+        os.replace("best_resnet18.pth.tmp", "best_resnet18.pth")
         print("Model saved!")
 
 print("Training Complete. Best Val Acc:", best_val_acc)
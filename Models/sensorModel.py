@@ -1,5 +1,9 @@
 # aqi_full_pipeline_fixed.py
 
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
@@ -7,6 +11,10 @@ from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, classification_report
 import pickle
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_model import AQI_CLASSES, SensorAQIModel  # noqa: E402
+
 # 1. Load dataset
 data = pd.read_csv(r"C:\Users\kartik\Desktop\Envira 2.0\Models\processed_sensor_dataset.csv")  # Replace with your path
 print(data.head())
@@ -83,30 +91,15 @@ with open('aqi_class_model.pkl', 'wb') as f:
 
 print("\nModels and scaler saved successfully!")
 
-# 8. Real-time prediction function (fixed warning)
-def predict_aqi_class_confidence(pm25, temp):
-    # Load models and scaler
-    with open('scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-    with open('aqi_model.pkl', 'rb') as f:
-        reg_model = pickle.load(f)
-    with open('aqi_class_model.pkl', 'rb') as f:
-        clf_model = pickle.load(f)
-
-    # Pass DataFrame with column names to avoid warning
-    X_input = pd.DataFrame([[pm25, temp]], columns=['PM2.5', 'TEMP'])
-    X_input_scaled = scaler.transform(X_input)
-
-    # Predict AQI value
-    aqi_pred = reg_model.predict(X_input_scaled)[0]
-
-    # Predict AQI class
-    class_pred = clf_model.predict(X_input_scaled)[0]
-
-    # Confidence scores
-    class_probs = clf_model.predict_proba(X_input_scaled)[0]
-    class_confidence = dict(zip(clf_model.classes_, class_probs))
+# 8. Real-time prediction: the models stay in memory (see sensor_model.py), no unpickling
+# or DataFrame per call; predictor.predict_batch takes many (PM2.5, TEMP) rows at once
+predictor = SensorAQIModel(reg_model, scaler, clf_model)
 
+def predict_aqi_class_confidence(pm25, temp):
+    result = predictor.predict_batch(np.array([[pm25, temp]]))
+    aqi_pred = float(result["aqi"][0])
+    class_pred = str(result["predicted_class"][0])
+    class_confidence = dict(zip(AQI_CLASSES, result["probabilities"][0].tolist()))
     return aqi_pred, class_pred, class_confidence
 
 # Example usage
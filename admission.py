@@ -0,0 +1,142 @@
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+
+
+class Shed(Exception):
+    """A request turned away before (or instead of) running inference."""
+
+    def __init__(self, reason, status_code=503, retry_after=1):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# -------------------------
+# Per-client token bucket
+# -------------------------
+class ClientRateLimiter:
+    """`rate` requests/s per client with bursts of up to `burst`.
+
+    Buckets are kept for the `max_clients` most recently seen clients; a
+    forgotten client simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_clients = int(max_clients)
+        self._buckets = OrderedDict()  # client -> (tokens, last refill)
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def acquire(self, client):
+        """0 if a token was taken, otherwise seconds until one is available."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1.0:
+            tokens -= 1.0
+        else:
+            wait = (1.0 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# -------------------------
+# Bounded admission
+# -------------------------
+class AdmissionController:
+    """Caps how many requests are waiting on or running inference.
+
+    At most `max_queue` requests are admitted at once; the next one is
+    rejected immediately with 503 instead of queueing without bound. Admitted
+    requests get `deadline_s` to finish and are abandoned (their batch slot
+    freed) when it passes or when the client disconnects. Retry-After is
+    estimated from the queue depth and recent service times.
+    """
+
+    def __init__(self, max_queue=64, deadline_s=10.0, workers=1, limiter=None, disconnect_poll_s=0.1):
+        self.max_queue = max(1, int(max_queue))
+        self.deadline = float(deadline_s)
+        self.workers = max(1, int(workers))
+        self.limiter = limiter
+        self.disconnect_poll = disconnect_poll_s
+
+        self.depth = 0
+        self.admitted = 0
+        self.shed = Counter()
+        self._service_time = 0.05  # EWMA of admitted request latency, seconds
+
+    def rate_limit(self, client):
+        if self.limiter is None:
+            return
+        wait = self.limiter.acquire(client)
+        if wait > 0:
+            self.shed["rate_limited"] += 1
+            raise Shed("Too many requests from this client", status_code=429, retry_after=math.ceil(wait))
+
+    def retry_after(self):
+        # Rough time for the current queue to drain
+        return max(1, min(30, math.ceil(self.depth * self._service_time / self.workers)))
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.depth >= self.max_queue:
+            self.shed["queue_full"] += 1
+            raise Shed("Server is busy, try again shortly", retry_after=self.retry_after())
+        self.depth += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield start + self.deadline if self.deadline > 0 else None
+        finally:
+            self.depth -= 1
+            elapsed = time.monotonic() - start
+            self._service_time += 0.1 * (elapsed - self._service_time)
+
+    async def run(self, awaitable, request=None, deadline=None):
+        """Await `awaitable`, giving up at `deadline` or when `request`'s client goes away."""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                timeout = self.disconnect_poll if request is not None else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed["deadline"] += 1
+                        raise Shed("Request deadline exceeded", retry_after=self.retry_after())
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+
+                done, _ = await asyncio.wait({task}, timeout=timeout)
+                if done:
+                    return task.result()
+                if request is not None and await request.is_disconnected():
+                    self.shed["disconnected"] += 1
+                    raise Shed("Client disconnected", status_code=499)
+        finally:
+            # Cancelling drops the request's place in the batcher queue
+            if not task.done():
+                task.cancel()
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_queue": self.max_queue,
+            "deadline_s": self.deadline,
+            "admitted": self.admitted,
+            "service_time_ms": round(self._service_time * 1000.0, 1),
+            "shed": dict(self.shed),
+            "rate_limit_per_s": self.limiter.rate if self.limiter else 0.0,
+            "rate_limit_burst": self.limiter.burst if self.limiter else 0.0,
+        }
@@ -0,0 +1,189 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sensor_model import AQI_BREAKPOINTS, AQI_CLASSES
+
+# -------------------------
+# EPA breakpoint tables
+# -------------------------
+# PRSA files report every pollutant in µg/m³; the gas tables are in ppb / ppm,
+# converted at 25 °C and 1 atm (ppb = µg/m³ * 24.45 / molar mass)
+MOLAR_VOLUME = 24.45
+
+
+class Pollutant:
+    """One pollutant's EPA table: rows of (C_low, C_high, AQI_low, AQI_high), lowest first.
+
+    `factor` converts the PRSA µg/m³ value to the table's unit, and
+    concentrations are truncated to `precision` before the lookup, as the
+    EPA method specifies.
+    """
+
+    def __init__(self, column, factor, precision, table):
+        self.column = column
+        self.factor = factor
+        self.precision = precision
+        self.c_low, self.c_high, self.i_low, self.i_high = (np.array(col, dtype=np.float64) for col in zip(*table))
+
+    def aqi(self, values):
+        """Piecewise-linear AQI for an array of µg/m³ concentrations (NaN stays NaN, capped at 500)."""
+        c = np.asarray(values, dtype=np.float64) * self.factor
+        # Truncate; the round() keeps 12.0 / 0.1 = 119.999... from dropping to 11.9
+        c = np.floor(np.round(np.maximum(c, 0.0) / self.precision, 6)) * self.precision
+        row = np.minimum(np.searchsorted(self.c_high, c, side="left"), len(self.c_high) - 1)
+        lo, hi = self.c_low[row], self.c_high[row]
+        aqi = (self.i_high[row] - self.i_low[row]) / (hi - lo) * (np.clip(c, lo, hi) - lo) + self.i_low[row]
+        aqi = np.where(c > self.c_high[-1], self.i_high[-1], np.round(aqi))
+        return np.where(np.isnan(c), np.nan, aqi)
+
+
+POLLUTANTS = {
+    # 24-hour PM2.5 (2012 table, the classes the sensor models were trained on)
+    "PM2.5": Pollutant("PM2.5", 1.0, 0.1, [
+        (0.0, 12.0, 0, 50), (12.1, 35.4, 51, 100), (35.5, 55.4, 101, 150), (55.5, 150.4, 151, 200),
+        (150.5, 250.4, 201, 300), (250.5, 350.4, 301, 400), (350.5, 500.4, 401, 500),
+    ]),
+    # 24-hour PM10
+    "PM10": Pollutant("PM10", 1.0, 1.0, [
+        (0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150), (255, 354, 151, 200),
+        (355, 424, 201, 300), (425, 504, 301, 400), (505, 604, 401, 500),
+    ]),
+    # 1-hour NO2, ppb
+    "NO2": Pollutant("NO2", MOLAR_VOLUME / 46.01, 1.0, [
+        (0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150), (361, 649, 151, 200),
+        (650, 1249, 201, 300), (1250, 1649, 301, 400), (1650, 2049, 401, 500),
+    ]),
+    # 8-hour CO, ppm
+    "CO": Pollutant("CO", MOLAR_VOLUME / 28.01 / 1000.0, 0.1, [
+        (0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150), (12.5, 15.4, 151, 200),
+        (15.5, 30.4, 201, 300), (30.5, 40.4, 301, 400), (40.5, 50.4, 401, 500),
+    ]),
+    # O3, ppm: the 8-hour table up to 0.200; above that EPA switches to the 1-hour
+    # table (0.205-0.404 -> 201-300, ...), so the AQI drops back to 201 just past 0.200
+    "O3": Pollutant("O3", MOLAR_VOLUME / 48.00 / 1000.0, 0.001, [
+        (0.000, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150), (0.086, 0.105, 151, 200),
+        (0.106, 0.200, 201, 300), (0.205, 0.404, 201, 300), (0.405, 0.504, 301, 400), (0.505, 0.604, 401, 500),
+    ]),
+    # 1-hour SO2, ppb
+    "SO2": Pollutant("SO2", MOLAR_VOLUME / 64.07, 1.0, [
+        (0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150), (186, 304, 151, 200),
+        (305, 604, 201, 300), (605, 804, 301, 400), (805, 1004, 401, 500),
+    ]),
+}
+
+
+def aqi_class(aqi):
+    """AQI values -> class index into AQI_CLASSES (int8, -1 where the AQI is NaN)."""
+    aqi = np.asarray(aqi, dtype=np.float64)
+    classes = np.searchsorted(AQI_BREAKPOINTS, np.nan_to_num(aqi), side="left").astype(np.int8)
+    return np.where(np.isnan(aqi), np.int8(-1), classes)
+
+
+def pm25_to_aqi(pm25):
+    """Scalar helper: (AQI, class name) for one PM2.5 concentration in µg/m³."""
+    aqi = float(POLLUTANTS["PM2.5"].aqi([pm25])[0])
+    return int(aqi), AQI_CLASSES[int(aqi_class([aqi])[0])]
+
+
+# -------------------------
+# Labeling
+# -------------------------
+def label_frame(df, pollutants=("PM2.5",), class_from="PM2.5"):
+    """Add AQI_<pollutant> per pollutant, AQI (the max), Dominant and AQI_Class columns to a DataFrame.
+
+    AQI_Class comes from `class_from`'s sub-index, or from the overall AQI when it is "overall".
+    """
+    subindices = {}
+    for name in pollutants:
+        subindices[name] = POLLUTANTS[name].aqi(df[POLLUTANTS[name].column].to_numpy(dtype=np.float64))
+    stacked = np.column_stack([subindices[name] for name in pollutants])
+    has_value = ~np.isnan(stacked).all(axis=1)
+    overall = np.full(len(df), np.nan)
+    dominant = np.full(len(df), "", dtype=object)
+    if has_value.any():
+        best = np.nanargmax(np.where(np.isnan(stacked), -1.0, stacked), axis=1)
+        overall[has_value] = stacked[has_value, best[has_value]]
+        dominant[has_value] = np.asarray(pollutants, dtype=object)[best[has_value]]
+
+    if len(pollutants) > 1:
+        for name in pollutants:
+            df[f"AQI_{name}"] = subindices[name]
+        df["Dominant"] = dominant
+    df["AQI"] = overall
+    df["AQI_Class"] = aqi_class(overall if class_from == "overall" else subindices[class_from])
+    return df
+
+
+def label_file(path, out_path, pollutants=("PM2.5",), keep=("PM2.5", "TEMP"), class_from="PM2.5",
+               chunksize=200000, dropna=True):
+    """Stream `path` in chunks of `chunksize` rows, label each and append it to `out_path`.
+
+    Only `keep` and the pollutant columns are read. Rows with no value for
+    the class pollutant are dropped unless `dropna` is False (they get
+    AQI_Class -1). Returns per-file stats.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    columns = list(dict.fromkeys(list(keep) + [POLLUTANTS[p].column for p in pollutants]))
+    counts = np.zeros(len(AQI_CLASSES), dtype=np.int64)
+    rows_in = rows_out = 0
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as out:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            rows_in += len(chunk)
+            chunk = label_frame(chunk, pollutants, class_from)
+            if dropna:
+                chunk = chunk[chunk["AQI_Class"] >= 0]
+            chunk = chunk[[c for c in keep] + [c for c in chunk.columns if c not in columns]]
+            chunk.to_csv(out, index=False, header=out.tell() == 0)
+            rows_out += len(chunk)
+            labels = chunk["AQI_Class"].to_numpy()
+            counts += np.bincount(labels[labels >= 0], minlength=len(AQI_CLASSES))
+    os.replace(tmp, out_path)
+    return {
+        "file": path,
+        "output": out_path,
+        "rows": rows_in,
+        "labeled": rows_out,
+        "seconds": round(time.perf_counter() - start, 3),
+        "classes": dict(zip(AQI_CLASSES, counts.tolist())),
+    }
+
+
+def _label_file(kwargs):
+    return label_file(**kwargs)
+
+
+def label_files(paths, out_dir, workers=None, suffix="_labeled", **options):
+    """Label every file in `paths` into `out_dir`, one process per file (up to `workers`)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        jobs.append({"path": path, "out_path": os.path.join(out_dir, stem + suffix + ".csv"), **options})
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [label_file(**job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_label_file, jobs))
+
+
+def combine(outputs, path, block_size=1 << 20):
+    """Concatenate labeled CSVs (same columns) into `path`, keeping the first header only."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as out:
+        for i, name in enumerate(outputs):
+            with open(name, "rb") as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                while True:
+                    block = f.read(block_size)
+                    if not block:
+                        break
+                    out.write(block)
+    os.replace(tmp, path)
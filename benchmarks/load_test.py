@@ -0,0 +1,302 @@
+"""Load test for server.py: mixed /api/predict + sensor traffic at fixed concurrency.
+
+Usage:
+    python benchmarks/load_test.py                              # app in-process (httpx ASGI transport)
+    python benchmarks/load_test.py --spawn                      # starts a local uvicorn on a free port
+    python benchmarks/load_test.py --url http://localhost:8000  # an already running server
+    python benchmarks/load_test.py --concurrency 32 --duration 30 --mix predict=1,sensor=4,history=0.2
+    python benchmarks/load_test.py --json after.json --compare before.json
+
+Each worker sends requests back to back (closed loop), so throughput is what
+the server sustains at that concurrency. Results go to --json for diffing
+between commits; --compare prints the change against an earlier file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from preprocess_benchmark import synthetic_jpeg  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_SIZES = [(320, 240), (1280, 720), (1920, 1080), (4032, 3024)]
+ENDPOINTS = {
+    "predict": ("POST", "/api/predict"),
+    "sensor": ("GET", "/api/sensor-data"),
+    "history": ("GET", "/api/sensor-data/history"),
+}
+
+
+# -------------------------
+# Traffic
+# -------------------------
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def make_images(variants):
+    # `variants` different images per size; > 1 keeps the prediction cache from answering everything
+    return [
+        (f"{w}x{h}", synthetic_jpeg(w, h, seed=i))
+        for w, h in IMAGE_SIZES
+        for i in range(variants)
+    ]
+
+
+async def send(client, name, images):
+    method, path = ENDPOINTS[name]
+    if name == "predict":
+        label, contents = random.choice(images)
+        response = await client.post(path, files={"file": (f"{label}.jpg", contents, "image/jpeg")})
+    elif name == "history":
+        response = await client.get(path, params={"points": 500})
+    else:
+        response = await client.get(path)
+
+    ok = response.status_code in (200, 304)
+    if ok and response.status_code == 200 and "json" in response.headers.get("content-type", ""):
+        ok = "error" not in response.json()
+    return ok, response.status_code
+
+
+async def worker(client, mix, images, deadline, max_requests, samples, counter):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline and counter[0] < max_requests:
+        counter[0] += 1
+        name = random.choices(names, weights=weights)[0]
+        start = time.perf_counter()
+        try:
+            ok, status = await send(client, name, images)
+        except httpx.HTTPError as e:
+            ok, status = False, type(e).__name__
+        samples.append((name, time.perf_counter() - start, ok, status))
+
+
+# -------------------------
+# Reporting
+# -------------------------
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = sorted(latency * 1000.0 for _, latency, _, _ in rows)
+        statuses = {}
+        for _, _, _, status in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, ok, _ in rows if not ok),
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50_ms": round(percentile(latencies, 0.50), 3) if latencies else None,
+            "p95_ms": round(percentile(latencies, 0.95), 3) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99), 3) if latencies else None,
+            "max_ms": round(latencies[-1], 3) if latencies else None,
+            "status_codes": statuses,
+        }
+
+    by_endpoint = {}
+    for row in samples:
+        by_endpoint.setdefault(row[0], []).append(row)
+    return {"overall": stats(samples), "endpoints": {name: stats(rows) for name, rows in sorted(by_endpoint.items())}}
+
+
+def print_table(summary):
+    print(f"\n{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = list(summary["endpoints"].items()) + [("overall", summary["overall"])]
+    for name, s in rows:
+        if not s["requests"]:
+            continue
+        print(f"{name:<12}{s['requests']:>10}{s['errors']:>8}{s['throughput_rps']:>10.1f}"
+              f"{s['p50_ms']:>8.1f}ms{s['p95_ms']:>8.1f}ms{s['p99_ms']:>8.1f}ms{s['max_ms']:>8.1f}ms")
+
+
+def print_comparison(summary, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)["summary"]
+    print(f"\nChange vs {previous_path} (negative latency / positive req/s is better)")
+    print(f"{'endpoint':<12}{'req/s':>12}{'p50':>12}{'p95':>12}{'p99':>12}")
+    names = sorted(set(summary["endpoints"]) & set(previous["endpoints"])) + ["overall"]
+    for name in names:
+        now = summary["overall"] if name == "overall" else summary["endpoints"][name]
+        before = previous["overall"] if name == "overall" else previous["endpoints"][name]
+
+        def delta(key):
+            if not now.get(key) or not before.get(key):
+                return "n/a"
+            return f"{(now[key] - before[key]) / before[key] * 100.0:+.1f}%"
+
+        print(f"{name:<12}{delta('throughput_rps'):>12}{delta('p50_ms'):>12}{delta('p95_ms'):>12}{delta('p99_ms'):>12}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------------
+# Targets
+# -------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_uvicorn(port):
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+
+
+async def wait_ready(client, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/api/ready")
+            if response.status_code == 200:
+                return response.json()
+        except httpx.TransportError:
+            pass  # spawned server not listening yet
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"Server not ready after {timeout:.0f} s")
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    images = make_images(args.variants) if "predict" in mix else []
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    app = None
+    process = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+        target = args.url
+    elif args.spawn:
+        port = free_port()
+        process = spawn_uvicorn(port)
+        target = f"http://127.0.0.1:{port}"
+        client = httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits)
+    else:
+        # In-process: no sockets, so this measures the app rather than the network stack
+        os.chdir(ROOT)
+        from server import app
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout)
+        target = "in-process"
+
+    try:
+        ready = await wait_ready(client, args.ready_timeout)
+
+        if args.warmup > 0:
+            await asyncio.gather(*[
+                worker(client, mix, images, time.perf_counter() + args.warmup, float("inf"), [], [0])
+                for _ in range(args.concurrency)
+            ])
+
+        samples, counter = [], [0]
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, mix, images, start + args.duration, args.requests or float("inf"), samples, counter)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+        server_stats = None
+        try:
+            server_stats = (await client.get("/api/predict/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            pass
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    return {
+        "target": target,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "requests": args.requests,
+            "mix": mix,
+            "image_sizes": [f"{w}x{h}" for w, h in IMAGE_SIZES],
+            "variants": args.variants,
+            "env": {k: v for k, v in os.environ.items() if k.startswith(("BATCH_", "INFERENCE_", "PREDICTION_CACHE", "TORCH_", "PREPROCESS", "PREDICT_", "CLIENT_RATE_"))},
+        },
+        "model_version": ready.get("model_version"),
+        "elapsed_s": round(elapsed, 3),
+        "summary": summarize(samples, elapsed),
+        "server_stats": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server")
+    target.add_argument("--spawn", action="store_true", help="start a local uvicorn for the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds to measure")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured traffic first")
+    parser.add_argument("--mix", default="predict=1,sensor=3", help="endpoint weights, e.g. predict=1,sensor=3,history=0.1")
+    parser.add_argument("--variants", type=int, default=8, help="distinct images per size")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json file to compare against")
+    args = parser.parse_args()
+    # The in-process target changes into the repo root (server.py uses relative paths)
+    args.json = args.json and os.path.abspath(args.json)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    results = asyncio.run(run(args))
+    summary = results["summary"]
+    print(f"Target: {results['target']}  commit: {results['commit']}  model: {results['model_version']}  "
+          f"concurrency: {args.concurrency}  elapsed: {results['elapsed_s']} s")
+    print_table(summary)
+
+    if args.compare:
+        print_comparison(summary, args.compare)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
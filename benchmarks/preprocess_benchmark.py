@@ -0,0 +1,94 @@
+"""Micro-benchmark: TRANSFORM (torchvision) vs the fast preprocessing path.
+
+Usage:
+    python benchmarks/preprocess_benchmark.py                 # synthetic JPEGs
+    python benchmarks/preprocess_benchmark.py --images DIR    # your own images
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_preprocess import BatchNormalizer, decode_resized, fast_transform  # noqa: E402
+from vision_model import TRANSFORM  # noqa: E402
+
+# Exact mode only differs by float rounding; draft mode trades a little accuracy for speed
+EXACT_TOLERANCE = 1e-5
+DRAFT_MEAN_TOLERANCE = 0.05
+
+SYNTHETIC_SIZES = [(640, 480), (1920, 1080), (4032, 3024)]
+
+
+def synthetic_jpeg(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    # Smooth gradients + noise compress like a photo rather than pure noise
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    arr = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def reference(contents):
+    return TRANSFORM(Image.open(io.BytesIO(contents)).convert("RGB"))
+
+
+def time_per_image(fn, contents, repeat):
+    fn(contents)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(contents)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of images to use instead of synthetic JPEGs")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, "**", "*.*"), recursive=True))[:20]
+        samples = [(os.path.basename(p), open(p, "rb").read()) for p in paths]
+    else:
+        samples = [(f"{w}x{h}", synthetic_jpeg(w, h)) for w, h in SYNTHETIC_SIZES]
+
+    normalizer = BatchNormalizer()
+    failed = False
+
+    print(f"{'image':<20}{'torchvision':>13}{'fast exact':>13}{'fast draft':>13}"
+          f"{'exact max|d|':>15}{'draft mean|d|':>15}")
+    for name, contents in samples:
+        ref = reference(contents)
+        exact = fast_transform(contents, draft=False)
+        draft = fast_transform(contents, draft=True)
+        exact_err = float((exact - ref).abs().max())
+        draft_err = float((draft - ref).abs().mean())
+
+        t_ref = time_per_image(reference, contents, args.repeat)
+        t_exact = time_per_image(lambda c: normalizer([decode_resized(c, draft=False)]), contents, args.repeat)
+        t_draft = time_per_image(lambda c: normalizer([decode_resized(c, draft=True)]), contents, args.repeat)
+
+        print(f"{name:<20}{t_ref:>11.2f}ms{t_exact:>11.2f}ms{t_draft:>11.2f}ms"
+              f"{exact_err:>15.2e}{draft_err:>15.4f}")
+
+        if exact_err > EXACT_TOLERANCE or draft_err > DRAFT_MEAN_TOLERANCE:
+            failed = True
+
+    if failed:
+        print(f"\nFAIL: output outside tolerance (exact {EXACT_TOLERANCE}, draft mean {DRAFT_MEAN_TOLERANCE})")
+        sys.exit(1)
+    print("\nOK: fast path matches TRANSFORM within tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Benchmark: sensor AQI prediction, per-call loading vs the resident batch predictor.
+
+Usage:
+    python benchmarks/sensor_model_benchmark.py
+    python benchmarks/sensor_model_benchmark.py --rows 100000 --repeat 1000
+
+Compares, for single rows and for one large batch:
+    per-call load   what Models/sensorModel.py used to do: unpickle the models and
+                    build a one-row DataFrame on every call
+    sklearn         the same models kept in memory, sklearn predict / predict_proba
+    resident        sensor_model.SensorAQIModel.predict_batch
+
+Without a classifier, the sklearn path only computes the AQI, while the resident
+one also counts every row's tree votes for the class probabilities.
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_model import (  # noqa: E402
+    AQI_BREAKPOINTS,
+    SENSOR_CLASS_MODEL_PATH,
+    SENSOR_MODEL_PATH,
+    SENSOR_SCALER_PATH,
+    load_sensor_model,
+)
+
+# Plausible PRSA ranges: PM2.5 in µg/m³, TEMP in °C
+PM25_RANGE = (0.0, 500.0)
+TEMP_RANGE = (-15.0, 40.0)
+
+
+def sample_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(*PM25_RANGE, n), rng.uniform(*TEMP_RANGE, n)])
+
+
+def load_pickles():
+    with open(SENSOR_SCALER_PATH, "rb") as f:
+        scaler = pickle.load(f)
+    with open(SENSOR_MODEL_PATH, "rb") as f:
+        regressor = pickle.load(f)
+    classifier = None
+    if os.path.isfile(SENSOR_CLASS_MODEL_PATH):
+        with open(SENSOR_CLASS_MODEL_PATH, "rb") as f:
+            classifier = pickle.load(f)
+    return scaler, regressor, classifier
+
+
+def per_call_load(pm25, temp):
+    import pandas as pd
+
+    scaler, regressor, classifier = load_pickles()
+    x = scaler.transform(pd.DataFrame([[pm25, temp]], columns=["PM2.5", "TEMP"]))
+    aqi = regressor.predict(x)[0]
+    if classifier is not None:
+        classifier.predict(x)
+        classifier.predict_proba(x)
+    return aqi
+
+
+def sklearn_batch(scaler, regressor, classifier, X):
+    x = scaler.transform(X)
+    aqi = regressor.predict(x)
+    if classifier is not None:
+        classifier.predict_proba(x)
+    return aqi
+
+
+def time_single(fn, rows, repeat):
+    times = []
+    for i in range(repeat):
+        pm25, temp = rows[i % len(rows)]
+        start = time.perf_counter()
+        fn(pm25, temp)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(times), statistics.mean(times)
+
+
+def time_batch(fn, X):
+    fn(X[:1000])  # warm-up
+    start = time.perf_counter()
+    result = fn(X)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="batch size for the throughput test")
+    parser.add_argument("--repeat", type=int, default=500, help="single-row calls per path")
+    parser.add_argument("--load-repeat", type=int, default=5, help="single-row calls for the per-call load path")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", category=UserWarning)  # sklearn feature-name / version warnings
+
+    scaler, regressor, classifier = load_pickles()
+    model = load_sensor_model()
+    print(f"Models: regressor {len(regressor.estimators_)} trees, "
+          f"classifier {'%d trees' % len(classifier.estimators_) if classifier is not None else 'absent (tree votes)'}; "
+          f"resident load {model.load_ms} ms")
+
+    rows = sample_rows(max(args.repeat, 100), seed=1)
+    print(f"\n{'single row':<16}{'median':>12}{'mean':>12}")
+    for name, fn, repeat in [
+        ("per-call load", per_call_load, args.load_repeat),
+        ("sklearn", lambda p, t: sklearn_batch(scaler, regressor, classifier, np.array([[p, t]])), args.repeat // 10),
+        ("resident", lambda p, t: model.predict(p, t), args.repeat),
+    ]:
+        median, mean = time_single(fn, rows, repeat)
+        print(f"{name:<16}{median:>10.3f}ms{mean:>10.3f}ms")
+
+    X = sample_rows(args.rows, seed=2)
+    t_sklearn, ref = time_batch(lambda X: sklearn_batch(scaler, regressor, classifier, X), X)
+    t_resident, out = time_batch(model.predict_batch, X)
+    print(f"\n{args.rows} rows{'':<6}{'seconds':>10}{'rows/s':>14}")
+    for name, seconds in [("sklearn", t_sklearn), ("resident", t_resident)]:
+        print(f"{name:<16}{seconds:>10.3f}{args.rows / seconds:>14,.0f}")
+    print(f"resident / sklearn time: {t_resident / t_sklearn:.2f}x"
+          + (" (sklearn: AQI only, no vote probabilities)" if classifier is None else ""))
+
+    max_diff = float(np.abs(out["aqi"] - ref).max())
+    classes_agree = float((np.searchsorted(AQI_BREAKPOINTS, ref, side="left")
+                           == np.searchsorted(AQI_BREAKPOINTS, out["aqi"], side="left")).mean())
+    print(f"\nmax |AQI difference| vs sklearn: {max_diff:.2e}, AQI class agreement: {classes_agree:.4%}")
+    if max_diff > 1e-9:
+        print("FAIL: resident predictor disagrees with sklearn")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+
+# -------------------------
+# Upload / archive iteration
+# -------------------------
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename):
+    name = (filename or "").lower()
+    return name.endswith(".zip") or name.endswith(TAR_EXTENSIONS)
+
+
+def _is_image(name):
+    base = os.path.basename(name)
+    return not base.startswith(".") and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_archive(fileobj, filename):
+    """Yield `(member_name, bytes)` for every image in a zip or tar archive.
+
+    Members are read one at a time, so only the current image is held in memory.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and _is_image(info.filename):
+                    yield info.filename, zf.read(info)
+    else:
+        # Stream mode: works on non-seekable files and any compression
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and _is_image(member.name):
+                    yield member.name, tf.extractfile(member).read()
+
+
+def iter_uploads(uploads):
+    """Yield `(name, bytes)` for a list of UploadFiles, expanding archives."""
+    for upload in uploads:
+        upload.file.seek(0)
+        if is_archive(upload.filename):
+            yield from iter_archive(upload.file, upload.filename)
+        else:
+            yield upload.filename, upload.file.read()
+
+
+# -------------------------
+# Pipelined bulk inference
+# -------------------------
+async def stream_predictions(source, executor, batch_size=32, prefetch=64, run_batch=None):
+    """Run images from `source` through `executor` and yield NDJSON lines.
+
+    Reading and decoding run ahead of inference by at most `prefetch` images,
+    forward passes use fixed batches of `batch_size`, and results come out in
+    input order as each batch completes. `run_batch` replaces
+    `executor.run_batch` for the forward pass (e.g. to pin a model version).
+    """
+    loop = asyncio.get_running_loop()
+    run_batch = run_batch or executor.run_batch
+    queue = asyncio.Queue(maxsize=max(1, prefetch))
+    source = iter(source)
+
+    async def produce():
+        index = 0
+        try:
+            while True:
+                # Archive reads are blocking file I/O
+                entry = await loop.run_in_executor(None, next, source, None)
+                if entry is None:
+                    break
+                name, contents = entry
+                task = asyncio.ensure_future(executor.preprocess(contents))
+                await queue.put((index, name, task))
+                index += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Unblock the consumer; the error surfaces when the producer is awaited
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        finished = False
+        while not finished:
+            batch = []
+            while len(batch) < batch_size:
+                entry = await queue.get()
+                if entry is None:
+                    finished = True
+                    break
+                batch.append(entry)
+            if not batch:
+                break
+
+            results = [None] * len(batch)
+            items, positions = [], []
+            for i, (_, _, task) in enumerate(batch):
+                try:
+                    items.append(await task)
+                    positions.append(i)
+                except Exception as e:
+                    results[i] = {"error": str(e)}
+
+            if items:
+                for i, result in zip(positions, await run_batch(items)):
+                    results[i] = result
+
+            for (index, name, _), result in zip(batch, results):
+                yield json.dumps({"index": index, "filename": name, **result}) + "\n"
+
+        # Surface archive errors (e.g. a corrupt zip) after what was readable
+        await producer
+    except Exception as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        producer.cancel()
@@ -0,0 +1,88 @@
+import io
+import threading
+
+import numpy as np
+import torch
+from PIL import Image
+
+# -------------------------
+# Fast decode + preprocessing
+# -------------------------
+# Replaces Resize((224, 224)) -> ToTensor -> Normalize with:
+#   1. JPEG draft decoding straight to a reduced scale (1/2, 1/4, 1/8) near 224 px
+#   2. a bilinear resize that stays in uint8
+#   3. one lookup-table gather per channel that does /255, -mean and /std at once,
+#      written into a preallocated float32 batch buffer
+INPUT_SIZE = 224
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+# lut[c][v] == (v / 255 - MEAN[c]) / STD[c], evaluated exactly like the torchvision ops
+_LUT = (
+    (torch.arange(256, dtype=torch.float32).div(255).unsqueeze(0)
+     - torch.tensor(MEAN).unsqueeze(1)) / torch.tensor(STD).unsqueeze(1)
+).numpy()
+
+
+def decode_image(contents, size=INPUT_SIZE, draft=True):
+    """Decode image bytes to an RGB PIL image.
+
+    With `draft=True` JPEGs are decoded at the smallest DCT scale that is still
+    at least `size` px on both sides, which skips most of the decode work for
+    large photos; output then differs slightly from a full-resolution resize.
+    """
+    img = Image.open(io.BytesIO(contents))
+    if draft:
+        img.draft("RGB", (size, size))
+    img.load()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def resize_array(img, size=INPUT_SIZE, draft=True):
+    """Bilinear resize to `size` x `size`, returned as an HxWx3 uint8 array."""
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.BILINEAR, reducing_gap=3.0 if draft else None)
+    return np.asarray(img)
+
+
+def decode_resized(contents, size=INPUT_SIZE, draft=True):
+    """Decode image bytes to a `size` x `size` x 3 uint8 array."""
+    return resize_array(decode_image(contents, size, draft), size, draft)
+
+
+class BatchNormalizer:
+    """Turns a list of HxWx3 uint8 arrays into a normalized NCHW float tensor.
+
+    Each thread keeps its own output buffer sized for the largest batch seen so
+    far, so steady-state batches allocate nothing. The returned tensor is a view
+    of that buffer and is only valid until the same thread normalizes again.
+    """
+
+    def __init__(self, size=INPUT_SIZE):
+        self.size = size
+        self._local = threading.local()
+
+    def _buffer(self, n):
+        buf = getattr(self._local, "buf", None)
+        if buf is None or buf.shape[0] < n:
+            buf = np.empty((n, 3, self.size, self.size), dtype=np.float32)
+            self._local.buf = buf
+        return buf[:n]
+
+    def __call__(self, arrays):
+        out = self._buffer(len(arrays))
+        for i, arr in enumerate(arrays):
+            for c in range(3):
+                np.take(_LUT[c], arr[:, :, c], out=out[i, c], mode="clip")
+        return torch.from_numpy(out)
+
+
+def fast_transform(img_bytes, draft=True):
+    """Single-image equivalent of TRANSFORM, returning a new 3x224x224 tensor."""
+    arr = decode_resized(img_bytes, draft=draft)
+    out = np.empty((3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+    for c in range(3):
+        np.take(_LUT[c], arr[:, :, c], out=out[c], mode="clip")
+    return torch.from_numpy(out)
@@ -0,0 +1,140 @@
+import copy
+import glob
+import inspect
+import io
+import os
+import random
+
+import torch
+import torch.nn as nn
+
+# -------------------------
+# Selectable CPU inference backends
+# -------------------------
+# eager        plain fp32 nn.Module (reference)
+# torchscript  traced, frozen and optimize_for_inference'd TorchScript
+# onnx         ONNX export executed by ONNX Runtime (optional deps: onnx, onnxruntime)
+# int8-dynamic dynamic INT8 quantization of the Linear head only: the fc layer
+#              is INT8, every convolution still runs in fp32
+# int8-static  FX graph-mode static INT8, calibrated on sample images
+BACKENDS = ("eager", "torchscript", "onnx", "int8-dynamic", "int8-static")
+
+INPUT_SHAPE = (1, 3, 224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class Backend:
+    """Callable wrapper: takes an NCHW float batch, returns logits on CPU/device."""
+
+    def __init__(self, name, fn, device):
+        self.name = name
+        self.fn = fn
+        self.device = device
+
+    def __call__(self, batch):
+        with torch.no_grad():
+            return self.fn(batch.to(self.device))
+
+
+def build_backend(name, model, calibration_dir=None, calibration_samples=64):
+    """Wrap an eval-mode fp32 `model` in the requested inference backend."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {BACKENDS}")
+
+    model.eval()
+    device = next(model.parameters()).device
+
+    if name == "eager":
+        return Backend(name, model, device)
+
+    if name == "torchscript":
+        example = torch.randn(INPUT_SHAPE, device=device)
+        with torch.no_grad():
+            scripted = torch.jit.freeze(torch.jit.trace(model, example).eval())
+            scripted = torch.jit.optimize_for_inference(scripted)
+            scripted(example)  # let the profiling executor specialize once
+        return Backend(name, scripted, device)
+
+    if name == "onnx":
+        return _build_onnx(model)
+
+    # Quantized kernels are CPU-only; work on a copy so `model` stays fp32 on its device
+    cpu_model = copy.deepcopy(model).to("cpu")
+    if name == "int8-dynamic":
+        # ResNet18's only nn.Linear is the fc head, so this is not an INT8 ResNet
+        quantized = torch.ao.quantization.quantize_dynamic(cpu_model, {nn.Linear}, dtype=torch.qint8)
+        return Backend(name, quantized, torch.device("cpu"))
+
+    return Backend(name, _quantize_static(cpu_model, calibration_dir, calibration_samples), torch.device("cpu"))
+
+
+def _build_onnx(model):
+    try:
+        import onnx  # noqa: F401  (needed by torch.onnx.export)
+        import onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("INFERENCE_BACKEND=onnx needs the optional packages: pip install onnx onnxruntime") from e
+
+    # Exported in memory: a shared file on disk would be rewritten by other
+    # worker processes / registry versions while a session is reading it
+    cpu_model = copy.deepcopy(model).to("cpu")
+    exported = io.BytesIO()
+    # torch >= 2.5 would otherwise pick the dynamo exporter, which needs onnxscript
+    legacy = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    torch.onnx.export(
+        cpu_model,
+        torch.randn(INPUT_SHAPE),
+        exported,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+        **legacy,
+    )
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = torch.get_num_threads()
+    session = ort.InferenceSession(exported.getvalue(), options, providers=["CPUExecutionProvider"])
+
+    def run(batch):
+        logits = session.run(None, {"input": batch.contiguous().numpy()})[0]
+        return torch.from_numpy(logits)
+
+    return Backend("onnx", run, torch.device("cpu"))
+
+
+def calibration_images(calibration_dir, samples, seed=0):
+    """Random sample of image paths under `calibration_dir` (an ImageFolder root)."""
+    if not calibration_dir or not os.path.isdir(calibration_dir):
+        raise ValueError("int8-static needs a calibration image folder (CALIBRATION_DIR)")
+    paths = [
+        p for p in glob.glob(os.path.join(calibration_dir, "**", "*"), recursive=True)
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    if not paths:
+        raise ValueError(f"No images found under {calibration_dir}")
+    random.Random(seed).shuffle(paths)
+    return paths[:samples]
+
+
+def _quantize_static(model, calibration_dir, samples):
+    from PIL import Image
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    from vision_model import TRANSFORM
+
+    engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+    torch.backends.quantized.engine = engine
+
+    example = torch.randn(INPUT_SHAPE)
+    prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example,))
+
+    # Observers record activation ranges on real frames
+    with torch.no_grad():
+        for path in calibration_images(calibration_dir, samples):
+            img = Image.open(path).convert("RGB")
+            prepared(TRANSFORM(img).unsqueeze(0))
+
+    return convert_fx(prepared)
@@ -0,0 +1,135 @@
+import asyncio
+import inspect
+from collections import Counter, deque
+
+
+# -------------------------
+# Dynamic micro-batching
+# -------------------------
+class InferenceBatcher:
+    """Collects concurrent inference requests into a single forward pass.
+
+    `run_batch` receives a list of inputs and must return (or, if it is a
+    coroutine function, resolve to) one result per input, in the same order.
+    A batch is dispatched as soon as `max_batch_size` items are waiting, or
+    `max_wait_ms` after the first item of the batch arrived. Up to
+    `max_in_flight` batches may be running at once.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5.0, max_in_flight=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_in_flight = max(1, int(max_in_flight))
+
+        self._pending = deque()
+        self._has_items = None
+        self._full = None
+        self._slots = None
+        self._worker = None
+        self._in_flight = set()
+
+        # Occupancy stats
+        self._batches = 0
+        self._requests = 0
+        self._sizes = Counter()
+        self._last_batch_size = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._has_items = asyncio.Event()
+            self._full = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        for task in list(self._in_flight):
+            task.cancel()
+        await asyncio.gather(self._worker, *self._in_flight, return_exceptions=True)
+        self._worker = None
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference batcher stopped"))
+
+    async def submit(self, item):
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _next_batch(self):
+        while not self._pending:
+            self._has_items.clear()
+            await self._has_items.wait()
+
+        if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+            self._full.clear()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+
+        size = min(len(self._pending), self.max_batch_size)
+        batch = [self._pending.popleft() for _ in range(size)]
+        # Callers that gave up (e.g. client disconnected) don't need a slot
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            # Take a slot first so requests keep accumulating while all slots are busy
+            await self._slots.acquire()
+            batch = await self._next_batch()
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            results = self.run_batch([item for item, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+        self._record(len(batch))
+
+    def _record(self, size):
+        self._batches += 1
+        self._requests += size
+        self._sizes[size] += 1
+        self._last_batch_size = size
+
+    def stats(self):
+        mean_size = self._requests / self._batches if self._batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._in_flight),
+            "batches": self._batches,
+            "requests": self._requests,
+            "queued": len(self._pending),
+            "last_batch_size": self._last_batch_size,
+            "mean_batch_size": round(mean_size, 3),
+            "mean_occupancy": round(mean_size / self.max_batch_size, 3),
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._sizes.items())},
+        }
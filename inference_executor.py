@@ -0,0 +1,106 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+
+import vision_model
+
+# -------------------------
+# Process-pool worker state
+# -------------------------
+# Each worker process holds its own copies of the models, keyed by checkpoint
+# path (model_registry snapshots are never rewritten), least recently used first
+_WORKER_MODELS = OrderedDict()
+_WORKER_MAX_MODELS = 2
+
+
+def _init_process_worker(torch_threads, max_models):
+    global _WORKER_MAX_MODELS
+    if torch_threads > 0:
+        torch.set_num_threads(torch_threads)
+    _WORKER_MAX_MODELS = max_models
+
+
+def _worker_model(checkpoint_path):
+    model = _WORKER_MODELS.get(checkpoint_path)
+    if model is None:
+        model = vision_model.load_inference_model(checkpoint_path)
+        _WORKER_MODELS[checkpoint_path] = model
+        while len(_WORKER_MODELS) > _WORKER_MAX_MODELS:
+            _WORKER_MODELS.popitem(last=False)
+    _WORKER_MODELS.move_to_end(checkpoint_path)
+    return model
+
+
+def _decode_and_predict(contents_list, checkpoint_path=None):
+    # Decode errors are reported per image so one bad upload can't fail the batch
+    results = [None] * len(contents_list)
+    tensors, positions = [], []
+    for i, contents in enumerate(contents_list):
+        try:
+            tensors.append(vision_model.preprocess_image(contents))
+            positions.append(i)
+        except Exception as e:
+            results[i] = {"error": str(e)}
+
+    if tensors:
+        model = _worker_model(checkpoint_path)
+        for i, result in zip(positions, vision_model.predict_batch(model, tensors)):
+            results[i] = result
+    return results
+
+
+# -------------------------
+# Executor layer
+# -------------------------
+class InferenceExecutor:
+    """Runs image decode, preprocessing and inference off the event loop.
+
+    mode="thread": decode/transform and the forward pass run in a thread pool
+    against the model given to the constructor; torch intra-op parallelism is
+    capped at `torch_threads` so concurrent batches don't oversubscribe cores.
+
+    mode="process": every worker process loads its own copy of the checkpoint
+    passed to `run_batch()` (keeping up to `max_models` of them) and does the
+    whole decode -> transform -> forward pipeline, so `preprocess()` only hands
+    the raw bytes through.
+    """
+
+    def __init__(self, model=None, mode="thread", workers=2, torch_threads=0, max_models=2):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.torch_threads = int(torch_threads)
+        self.model = model
+
+        if mode == "thread":
+            if self.torch_threads > 0:
+                torch.set_num_threads(self.torch_threads)
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        else:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_process_worker,
+                initargs=(self.torch_threads, max(1, int(max_models))),
+            )
+
+    async def preprocess(self, contents):
+        if self.mode == "process":
+            return contents
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, vision_model.preprocess_image, contents)
+
+    async def run_batch(self, items, model=None, checkpoint_path=None):
+        # `model` overrides self.model in thread mode; process workers load `checkpoint_path`
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            return await loop.run_in_executor(self._pool, _decode_and_predict, items, checkpoint_path)
+        return await loop.run_in_executor(self._pool, vision_model.predict_batch, model if model is not None else self.model, items)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {"mode": self.mode, "workers": self.workers, "torch_threads": self.torch_threads}
@@ -0,0 +1,230 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# -------------------------
+# Minimal Prometheus-style metrics
+# -------------------------
+# No client library: a histogram observation is one bisect and three adds
+# under a lock, cheap enough to leave on in production.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, ('le', bound))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, ('le', '+Inf'))} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        # fn() is called at scrape time, e.g. to copy queue depths into gauges
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Application metrics
+# -------------------------
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "envira_stage_latency_seconds",
+    "Latency of individual request stages (upload_read, decode, transform, forward, postprocess, csv_read, ...)",
+    ("stage",),
+))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "envira_http_request_duration_seconds", "HTTP request latency", ("path",),
+))
+REQUESTS = REGISTRY.register(Counter(
+    "envira_http_requests_total", "HTTP requests", ("path", "method", "status"),
+))
+ERRORS = REGISTRY.register(Counter(
+    "envira_request_errors_total", "Requests that failed (5xx or an error payload)", ("path",),
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "envira_http_in_flight_requests", "Requests currently being handled", ("path",),
+))
+
+
+def stage_timer(stage):
+    """with stage_timer("decode"): ...  -> one observation in envira_stage_latency_seconds."""
+    return STAGE_LATENCY.labels(stage).time()
+
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def record_error(path):
+    ERRORS.labels(path).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-path request counts, latency and in-flight gauges.
+
+    Only the app's own route paths get their own label; everything else is
+    "other" so scanners can't blow up label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.known_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.known_paths is None:
+            # Routes are all registered by the time the first request arrives
+            self.known_paths = {getattr(r, "path", None) for r in scope["app"].routes}
+        path = scope["path"] if scope["path"] in self.known_paths else "other"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(path)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(path).observe(time.perf_counter() - start)
+            REQUESTS.labels(path, scope["method"], str(status["code"])).inc()
+            if status["code"] >= 500:
+                ERRORS.labels(path).inc()
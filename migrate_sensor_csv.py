@@ -0,0 +1,79 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from sensor_history import parse_timestamps
+from sensor_store import DEFAULT_DEVICE, RECORD, SensorStore, store_path
+
+# ------------------------------
+# One-shot migration: sensor_data.csv -> sensor store
+# ------------------------------
+# Usage:
+#   python migrate_sensor_csv.py
+#   python migrate_sensor_csv.py --csv sensor_data.csv --store sensor_store --device default
+CHUNK_ROWS = 100_000
+
+
+def read_chunks(csv_path, chunk_rows=CHUNK_ROWS):
+    """Yield RECORD arrays of up to `chunk_rows` valid rows, streaming the file."""
+    stamps, pm25, gas = [], [], []
+    skipped = 0
+    with open(csv_path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or not row[0][:1].isdigit():
+                skipped += 1
+                continue
+            try:
+                p, g = float(row[1]), float(row[2])
+            except ValueError:
+                skipped += 1
+                continue
+            stamps.append(row[0])
+            pm25.append(p)
+            gas.append(g)
+            if len(stamps) >= chunk_rows:
+                yield _to_records(stamps, pm25, gas), skipped
+                stamps, pm25, gas = [], [], []
+                skipped = 0
+    if stamps or skipped:
+        yield _to_records(stamps, pm25, gas), skipped
+
+
+def _to_records(stamps, pm25, gas):
+    records = np.empty(len(stamps), dtype=RECORD)
+    if stamps:
+        records["ts"] = parse_timestamps(stamps)
+        records["pm25"] = pm25
+        records["gas"] = gas
+        # Sorted within the chunk; a step back across chunks is marked by the store
+        # and sorted when the day is compressed
+        records.sort(order="ts", kind="stable")
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate sensor_data.csv into the partitioned sensor store")
+    parser.add_argument("--csv", default="sensor_data.csv")
+    parser.add_argument("--store", default=None, help="store root (default: SENSOR_STORE_DIR or ./sensor_store)")
+    parser.add_argument("--device", default=DEFAULT_DEVICE)
+    args = parser.parse_args()
+
+    store = SensorStore(store_path(args.device, args.store), writer=True)
+    if store.segments():
+        raise SystemExit(f"{store.root} already has data; refusing to migrate twice")
+
+    start = time.perf_counter()
+    rows = skipped = 0
+    for records, bad in read_chunks(args.csv):
+        store.append_many(records)
+        rows += len(records)
+        skipped += bad
+        print(f"  {rows} rows migrated...")
+    # Everything but the most recent day is closed history
+    store.compact()
+    store.close()
+
+    print(f"Migrated {rows} rows ({skipped} skipped) into {store.root} in {time.perf_counter() - start:.2f}s")
+    print(store.stats())
@@ -0,0 +1,253 @@
+import asyncio
+import glob
+import os
+import random
+import shutil
+import time
+from collections import OrderedDict
+
+from prediction_cache import checkpoint_version
+
+
+# -------------------------
+# Resident model versions
+# -------------------------
+class ModelVersion:
+    """One loaded checkpoint. `model` is None when process workers hold the copies."""
+
+    def __init__(self, version, path, source, model=None):
+        self.version = version
+        self.path = path        # private snapshot, never rewritten by training
+        self.source = source    # checkpoint it was copied from
+        self.model = model
+        self.loaded_at = time.time()
+        self.timings_ms = {}
+        self.requests = 0
+
+    def info(self):
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "requests": self.requests,
+            "timings_ms": self.timings_ms,
+        }
+
+
+class ModelRegistry:
+    """Loads checkpoints in the background and swaps them in atomically.
+
+    Every checkpoint is first copied to `snapshot_dir` (so a retrain
+    overwriting the file can't change a loaded version underneath us), then
+    `load_fn(path)` builds the model in a worker thread and `warm_fn(entry)`
+    runs warm-up inferences. Only then does the entry become visible, so
+    requests never wait on a load. Up to `max_resident` versions stay
+    loaded for rollback and traffic splitting; the active version and any
+    version in the split are never evicted.
+
+    Requests call `pick()` once and carry the returned entry through the
+    batcher, so a swap mid-request can't mix versions inside one forward pass.
+    """
+
+    def __init__(self, load_fn, run_fn, warm_fn=None, snapshot_dir="model_versions", max_resident=2):
+        self.load_fn = load_fn
+        self.run_fn = run_fn
+        self.warm_fn = warm_fn
+        self.snapshot_dir = snapshot_dir
+        self.max_resident = max(1, int(max_resident))
+
+        self._versions = OrderedDict()  # version -> ModelVersion, oldest first
+        self._active = None
+        self._previous = None
+        self._split = {}
+        self._load_lock = None
+        self._watch_task = None
+
+        self.loading = None
+        self.last_error = None
+
+    # ---- selection ----
+    @property
+    def active(self):
+        return self._versions.get(self._active)
+
+    def active_version(self):
+        return self._active
+
+    def pick(self):
+        """Version that should serve the next request (honours the traffic split)."""
+        if self._split:
+            versions = list(self._split)
+            version = random.choices(versions, weights=[self._split[v] for v in versions])[0]
+            entry = self._versions.get(version)
+            if entry is not None:
+                return entry
+        return self.active
+
+    async def run_batch(self, pairs):
+        """Batcher callback: `pairs` are (entry, item); items are grouped per version."""
+        groups = OrderedDict()
+        for i, (entry, item) in enumerate(pairs):
+            groups.setdefault(entry, []).append((i, item))
+
+        async def run(entry, members):
+            entry.requests += len(members)
+            results = await self.run_fn(entry, [item for _, item in members])
+            return [(i, {**result, "model_version": entry.version}) for (i, _), result in zip(members, results)]
+
+        results = [None] * len(pairs)
+        for group in await asyncio.gather(*[run(entry, members) for entry, members in groups.items()]):
+            for i, result in group:
+                results[i] = result
+        return results
+
+    # ---- loading ----
+    async def load(self, source, activate=True):
+        """Snapshot, load and warm `source`; returns the resident ModelVersion."""
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            version = checkpoint_version(source)
+            entry = self._versions.get(version)
+            if entry is None:
+                entry = await self._load(source, version)
+            if activate:
+                self.activate(entry.version)
+            return entry
+
+    async def _load(self, source, version):
+        loop = asyncio.get_running_loop()
+        self.loading = source
+        try:
+            start = time.perf_counter()
+            path = await loop.run_in_executor(None, self._snapshot, source, version)
+            snapshot_ms = (time.perf_counter() - start) * 1000.0
+
+            start = time.perf_counter()
+            entry = ModelVersion(version, path, source, await loop.run_in_executor(None, self.load_fn, path))
+            entry.timings_ms["snapshot_ms"] = round(snapshot_ms, 1)
+            entry.timings_ms["model_load_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+
+            if self.warm_fn is not None:
+                start = time.perf_counter()
+                await self.warm_fn(entry)
+                entry.timings_ms["warmup_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+        except Exception as e:
+            self.last_error = f"{source}: {e}"
+            raise
+        finally:
+            self.loading = None
+
+        self.last_error = None
+        self._versions[version] = entry
+        self._evict(keep=(version,))
+        return entry
+
+    def _snapshot(self, source, version):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, version + os.path.splitext(source)[1])
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            shutil.copy2(source, tmp)
+            os.replace(tmp, path)
+        return path
+
+    # ---- switching ----
+    def activate(self, version):
+        if version not in self._versions:
+            raise KeyError(f"Model version {version} is not loaded")
+        if version != self._active:
+            # A single assignment: requests already holding the old entry finish on it
+            self._previous, self._active = self._active, version
+        self._evict()
+
+    def rollback(self):
+        if self._previous is None or self._previous not in self._versions:
+            raise KeyError("No previous model version is loaded")
+        self.activate(self._previous)
+
+    def set_split(self, weights):
+        """{version: weight} routes that share of requests to each version; {} clears it."""
+        for version, weight in weights.items():
+            if version not in self._versions:
+                raise KeyError(f"Model version {version} is not loaded")
+            if weight < 0:
+                raise ValueError("Split weights must be >= 0")
+        if weights and sum(weights.values()) <= 0:
+            raise ValueError("At least one split weight must be > 0")
+        self._split = {v: float(w) for v, w in weights.items() if w > 0}
+
+    def unload(self, version):
+        if version == self._active or version in self._split:
+            raise ValueError(f"Model version {version} is serving traffic")
+        self._versions.pop(version, None)
+
+    def _evict(self, keep=()):
+        pinned = {self._active, *self._split, *keep}
+        for version in list(self._versions):
+            if len(self._versions) <= self.max_resident:
+                break
+            if version not in pinned:
+                del self._versions[version]
+        self._prune_snapshots()
+
+    def _prune_snapshots(self):
+        # Keep snapshots of resident versions plus a few recent ones for reloading
+        keep = set(self._versions)
+        snapshots = sorted(glob.glob(os.path.join(self.snapshot_dir, "*.*")), key=os.path.getmtime, reverse=True)
+        spare = self.max_resident
+        for path in snapshots:
+            version = os.path.splitext(os.path.basename(path))[0]
+            if version in keep or path.endswith(".tmp"):
+                continue
+            if spare > 0:
+                spare -= 1
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ---- watching ----
+    def watch(self, source, interval=5.0, activate=True):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(source, interval, activate))
+
+    async def _watch(self, source, interval, activate):
+        active = self.active
+        seen = active.version if active is not None and active.source == source else checkpoint_version(source)
+        settled = None
+        while True:
+            await asyncio.sleep(interval)
+            version = checkpoint_version(source)
+            if version == "unknown" or version == seen:
+                settled = None
+                continue
+            # Wait for one unchanged poll so a checkpoint still being written isn't loaded
+            if version != settled:
+                settled = version
+                continue
+            try:
+                entry = await self.load(source, activate=activate)
+                print(f"Loaded model version {entry.version} from {source}: {entry.timings_ms}")
+            except Exception as e:
+                print(f"Model reload failed: {e}")
+            seen = version
+            settled = None
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "previous": self._previous,
+            "split": self._split,
+            "max_resident": self.max_resident,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "versions": [entry.info() for entry in self._versions.values()],
+        }
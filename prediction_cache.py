@@ -0,0 +1,132 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+# -------------------------
+# Model version fingerprint
+# -------------------------
+def checkpoint_version(path):
+    """Cheap fingerprint of a checkpoint file: changes whenever it is rewritten."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "unknown"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+# -------------------------
+# Content-addressed LRU + TTL cache
+# -------------------------
+class PredictionCache:
+    """Maps a hash of the uploaded bytes to a stored prediction.
+
+    Bounded both by entry count and by approximate bytes held. Entries older
+    than `ttl_seconds` are treated as misses. `version_fn` returns the version
+    of the model currently active; when it changes the whole cache is dropped.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl_seconds=300.0, version_fn=None):
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl_seconds)
+        self.version_fn = version_fn
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, result)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @staticmethod
+    def key(contents, model_version=""):
+        # The version is part of the key so split traffic never gets another version's answer
+        h = hashlib.blake2b(model_version.encode(), digest_size=16)
+        h.update(contents)
+        return h.digest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        size = len(key) + sys.getsizeof(result) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in result.items()
+        )
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, result)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "model_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
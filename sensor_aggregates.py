@@ -0,0 +1,318 @@
+import json
+import math
+import os
+import threading
+import time
+
+from aqi_labels import pm25_to_aqi
+
+# -------------------------
+# Config
+# -------------------------
+# (name, span, bucket width) in seconds; a window covers its last span/bucket
+# buckets, so its edge moves in steps of one bucket
+WINDOWS = (
+    ("1m", 60, 1),
+    ("1h", 3600, 60),
+    ("24h", 86400, 900),
+)
+METRICS = ("pm25", "mq135")
+PERCENTILES = (0.5, 0.95, 0.99)
+
+EWMA_TAU_S = float(os.environ.get("SENSOR_EWMA_TAU_S", "300"))
+SKETCH_ACCURACY = float(os.environ.get("SENSOR_SKETCH_ACCURACY", "0.01"))
+AGGREGATES_SAVE_S = float(os.environ.get("SENSOR_AGGREGATES_SAVE_S", "5"))
+
+# Files inside a device's store directory (sensor_store/<device>/)
+SUMMARY_FILE = "aggregates.json"
+STATE_FILE = "aggregates.state.json"
+
+# -------------------------
+# Streaming percentiles
+# -------------------------
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch-style).
+
+    A value x lands in bucket ceil(log_gamma(x)), so every quantile is
+    returned within `accuracy` relative error. Inserts are O(1), memory
+    grows with the log of the value range, and sketches merge by adding
+    counts, which is what lets the rolling windows combine their buckets.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, x):
+        if x <= 0:
+            self.zeros += 1
+        else:
+            i = math.ceil(math.log(x) / self._log_gamma)
+            self.bins[i] = self.bins.get(i, 0) + 1
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in other.bins.items():
+            self.bins[i] = self.bins.get(i, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.bins):
+            seen += self.bins[i]
+            if seen > rank:
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {"zeros": self.zeros, "bins": {str(i): n for i, n in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data, accuracy=SKETCH_ACCURACY):
+        sketch = cls(accuracy)
+        sketch.zeros = data["zeros"]
+        sketch.bins = {int(i): n for i, n in data["bins"].items()}
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+# -------------------------
+# Rolling window
+# -------------------------
+class RollingWindow:
+    """count / sum / min / max / sketch for each bucket of a ring covering `span_s`.
+
+    Adding a reading touches one bucket (a bucket that has fallen out of the
+    window is reset when its slot comes round again); a summary combines the
+    fixed number of live buckets, never the readings themselves.
+    """
+
+    def __init__(self, span_s, bucket_s, accuracy=SKETCH_ACCURACY):
+        self.bucket_s = bucket_s
+        self.n = int(span_s // bucket_s)
+        self.accuracy = accuracy
+        self.ids = [None] * self.n
+        self.counts = [0] * self.n
+        self.sums = [0.0] * self.n
+        self.mins = [math.inf] * self.n
+        self.maxs = [-math.inf] * self.n
+        self.sketches = [None] * self.n
+
+    def add(self, ts, x):
+        bucket = int(ts // self.bucket_s)
+        i = bucket % self.n
+        current = self.ids[i]
+        if current != bucket:
+            if current is not None and current > bucket:
+                return  # older than the whole window
+            self.ids[i] = bucket
+            self.counts[i] = 0
+            self.sums[i] = 0.0
+            self.mins[i] = math.inf
+            self.maxs[i] = -math.inf
+            self.sketches[i] = QuantileSketch(self.accuracy)
+        self.counts[i] += 1
+        self.sums[i] += x
+        if x < self.mins[i]:
+            self.mins[i] = x
+        if x > self.maxs[i]:
+            self.maxs[i] = x
+        self.sketches[i].add(x)
+
+    def summary(self, now):
+        """Stats over the buckets inside the window ending at `now`."""
+        newest = int(now // self.bucket_s)
+        live = [i for i, b in enumerate(self.ids) if b is not None and newest - self.n < b <= newest]
+        count = sum(self.counts[i] for i in live)
+        if count == 0:
+            return {"count": 0}
+        sketch = QuantileSketch(self.accuracy)
+        for i in live:
+            sketch.merge(self.sketches[i])
+        result = {
+            "count": count,
+            "mean": round(sum(self.sums[i] for i in live) / count, 2),
+            "min": round(min(self.mins[i] for i in live), 2),
+            "max": round(max(self.maxs[i] for i in live), 2),
+        }
+        for q in PERCENTILES:
+            result[f"p{round(q * 100)}"] = round(sketch.quantile(q), 2)
+        return result
+
+    def to_dict(self):
+        return [
+            [b, self.counts[i], self.sums[i], self.mins[i], self.maxs[i], self.sketches[i].to_dict()]
+            for i, b in enumerate(self.ids) if b is not None
+        ]
+
+    def load(self, buckets):
+        for b, count, total, lo, hi, sketch in buckets:
+            i = b % self.n
+            if self.ids[i] is None or self.ids[i] < b:
+                self.ids[i] = b
+                self.counts[i] = count
+                self.sums[i] = total
+                self.mins[i] = lo
+                self.maxs[i] = hi
+                self.sketches[i] = QuantileSketch.from_dict(sketch, self.accuracy)
+
+
+# -------------------------
+# Per-device aggregator
+# -------------------------
+class StreamAggregator:
+    """Incremental aggregates for one device, updated as each reading is ingested.
+
+    Keeps rolling 1 m / 1 h / 24 h windows and a time-weighted EWMA
+    (time constant `tau_s`) for PM2.5 and gas. `save()` writes a small
+    summary (aggregates.json, served by /api/sensor-data/aggregates) and the
+    full bucket state (aggregates.state.json, reloaded on restart) into the
+    device's store directory, at most every `save_interval_s` unless forced.
+    Timestamps are the store's naive local seconds.
+    """
+
+    def __init__(self, root, tau_s=EWMA_TAU_S, save_interval_s=AGGREGATES_SAVE_S, accuracy=SKETCH_ACCURACY):
+        self.root = root
+        self.tau = float(tau_s)
+        self.save_interval = float(save_interval_s)
+        self.windows = {
+            name: {m: RollingWindow(span, bucket, accuracy) for m in METRICS}
+            for name, span, bucket in WINDOWS
+        }
+        self.ewma = dict.fromkeys(METRICS)
+        self.last_ts = None
+        self.readings = 0
+        self._dirty = False
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+        self._load_state()
+
+    def add(self, ts, pm25, gas):
+        """Returns False (and changes nothing) for a non-finite timestamp or value."""
+        if not (math.isfinite(ts) and math.isfinite(pm25) and math.isfinite(gas)):
+            return False
+        with self._lock:
+            for metric, x in zip(METRICS, (pm25, gas)):
+                for windows in self.windows.values():
+                    windows[metric].add(ts, x)
+            if self.last_ts is None or ts >= self.last_ts:
+                dt = 0.0 if self.last_ts is None else ts - self.last_ts
+                alpha = -math.expm1(-dt / self.tau) if self.tau > 0 else 1.0
+                for metric, x in zip(METRICS, (pm25, gas)):
+                    prev = self.ewma[metric]
+                    self.ewma[metric] = x if prev is None else prev + alpha * (x - prev)
+                self.last_ts = ts
+            self.readings += 1
+            self._dirty = True
+        return True
+
+    def summary(self):
+        with self._lock:
+            return self._summary_locked()
+
+    def _summary_locked(self):
+        if self.last_ts is None:
+            return {"readings": 0}
+        windows = {
+            name: {m: w.summary(self.last_ts) for m, w in metrics.items()}
+            for name, metrics in self.windows.items()
+        }
+        summary = {
+            "as_of": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.last_ts)),
+            "readings": self.readings,
+            "windows": windows,
+            "ewma": {m: round(v, 2) for m, v in self.ewma.items()},
+            "ewma_tau_s": self.tau,
+        }
+        day = windows["24h"]["pm25"]
+        if day["count"]:
+            aqi, category = pm25_to_aqi(day["mean"])
+            summary["aqi_24h"] = {"pm25_mean": day["mean"], "aqi": aqi, "category": category}
+        return summary
+
+    def save(self, force=False):
+        """Persist summary and state if anything changed (and the interval is up, unless `force`)."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._dirty or (not force and now - self._last_save < self.save_interval):
+                return False
+            summary = self._summary_locked()
+            state = {
+                "tau_s": self.tau,
+                "last_ts": self.last_ts,
+                "readings": self.readings,
+                "ewma": self.ewma,
+                "windows": {name: {m: w.to_dict() for m, w in metrics.items()} for name, metrics in self.windows.items()},
+            }
+            self._dirty = False
+            self._last_save = now
+        os.makedirs(self.root, exist_ok=True)
+        _write_json(os.path.join(self.root, STATE_FILE), state)
+        _write_json(os.path.join(self.root, SUMMARY_FILE), summary)
+        return True
+
+    def close(self):
+        self.save(force=True)
+
+    def _load_state(self):
+        path = os.path.join(self.root, STATE_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            print(f"Ignoring unreadable aggregate state {path}: {e}")
+            return
+        self.last_ts = state["last_ts"]
+        self.readings = state["readings"]
+        self.ewma.update(state["ewma"])
+        for name, metrics in state["windows"].items():
+            for metric, buckets in metrics.items():
+                if name in self.windows and metric in self.windows[name]:
+                    self.windows[name][metric].load(buckets)
+
+
+def _write_json(path, data):
+    # Readers in another process must never see a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Reading (API side)
+# -------------------------
+class SummaryCache:
+    """The parsed aggregates.json of a store directory, re-read only when its mtime changes."""
+
+    def __init__(self, root):
+        self.path = os.path.join(root, SUMMARY_FILE)
+        self._key = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Raises FileNotFoundError until the ingest process has saved once."""
+        st = os.stat(self.path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key == self._key:
+                return self._value
+        with open(self.path, encoding="utf-8") as f:
+            value = json.load(f)
+        with self._lock:
+            self._key = key
+            self._value = value
+        return value
@@ -1,15 +1,19 @@
 import serial
-import csv
 import time
-from datetime import datetime
 import os
 from collections import deque
 
+from sensor_aggregates import StreamAggregator
+from sensor_sampling import AdaptiveSampler, ArduinoClock, LineReader, parse_reading
+from sensor_shm import RingWriter, ring_path
+from sensor_store import SensorStore, local_seconds, store_path
+from sensor_writer import BufferedCSVWriter, close_on_exit
+
 # ------------------------------
 # Connect to Arduino
 # ------------------------------
 try:
-    ser = serial.Serial('COM7', 115200, timeout=1)
+    ser = serial.Serial('COM7', 115200, timeout=0.2)
     time.sleep(2)
     print("Arduino connected on COM7")
 except serial.SerialException as e:
@@ -17,21 +21,64 @@ except serial.SerialException as e:
     print("Please check the port number and ensure the Arduino is connected.")
     exit()
 
+# ------------------------------
+# Partitioned store (queried by /api/sensor-data/history)
+# ------------------------------
+# Holds the device's writer lock: exits here if sensor_ingest.py is already logging this device
+try:
+    store = SensorStore(store_path(), writer=True)
+except RuntimeError as e:
+    ser.close()
+    print(f"Error: {e}")
+    exit()
+
+# Rolling 1 m / 1 h / 24 h stats, EWMA and percentiles, updated per reading
+# (served by /api/sensor-data/aggregates)
+aggregator = StreamAggregator(store_path())
+
+# Shared-memory ring the API reads the latest reading from, without touching the CSV
+ring = RingWriter(ring_path())
+ring.seed(store)
+
 # ------------------------------
 # CSV setup
 # ------------------------------
 file_name = "sensor_data.csv"
 fields = ["timestamp", "pm25_ug_m3", "gas_ppm"]
 
-file_exists = os.path.isfile(file_name)
-
-with open(file_name, 'a', newline='') as f:
-    writer = csv.writer(f)
-    if not file_exists:
-        writer.writerow(fields)
+# One open file; rows are flushed every SENSOR_CSV_FLUSH_ROWS rows or
+# SENSOR_CSV_FLUSH_S seconds, fsync per SENSOR_CSV_FSYNC (always | interval | never)
+writer = BufferedCSVWriter(
+    file_name,
+    header=fields,
+    max_rows=int(os.environ.get("SENSOR_CSV_FLUSH_ROWS", "64")),
+    max_delay_s=float(os.environ.get("SENSOR_CSV_FLUSH_S", "1")),
+    fsync=os.environ.get("SENSOR_CSV_FSYNC", "interval"),
+    fsync_interval_s=float(os.environ.get("SENSOR_CSV_FSYNC_S", "10")),
+    on_flush=lambda fsync: (store.flush(fsync=fsync), aggregator.save()),
+)
+STATS_INTERVAL_S = float(os.environ.get("SENSOR_WRITER_STATS_S", "60"))
+
+# Buffered rows are written out on Ctrl+C, SIGTERM/SIGHUP (SIGBREAK on Windows) and normal exit
+close_all = close_on_exit(writer, aggregator, store, ring, ser)
 
 print("Logging PM2.5 + Gas sensor data... Press Ctrl+C to stop.")
 
+# ------------------------------
+# Sampling
+# ------------------------------
+# The serial buffer is drained continuously; readings are averaged into one
+# row every SENSOR_SAMPLE_MAX_S seconds, or every SENSOR_SAMPLE_MIN_S once
+# PM2.5 moves by SENSOR_PM25_DELTA µg/m³ from the last row
+reader = LineReader(ser)
+clock = ArduinoClock()
+sampler = AdaptiveSampler(
+    min_interval_s=float(os.environ.get("SENSOR_SAMPLE_MIN_S", "0.5")),
+    max_interval_s=float(os.environ.get("SENSOR_SAMPLE_MAX_S", "5")),
+    pm25_delta=float(os.environ.get("SENSOR_PM25_DELTA", "5")),
+)
+parse_errors = 0
+
 # ------------------------------
 # Gas sensor smoothing buffer
 # ------------------------------
@@ -40,65 +87,62 @@ gas_buffer = deque(maxlen=5)  # keep last 5 readings for moving average
 # ------------------------------
 # Main loop
 # ------------------------------
+last_stats = time.monotonic()
 try:
     while True:
-        # Read from Arduino
-        line = ser.readline().decode("utf-8", errors="ignore").strip()
-
-        # Skip empty or invalid lines
-        if not line or not line[0].isdigit():
-            time.sleep(0.1)
-            continue
-
-        try:
-            parts = line.split(",")
-            if len(parts) == 3:
-                timestamp_ms = float(parts[0])
-                raw_pm25 = float(parts[1])
-                raw_gas = float(parts[2])
-
-                # ------------------------------
-                # Adjust PM2.5 to realistic range
-                # ------------------------------
-                pm25 = max(round(raw_pm25, 2), 0.0)
-
-                # ------------------------------
-                # Adjust Gas sensor value
-                # ------------------------------
-                # Example calibration factor: divide by 10
-                gas_ppm_calibrated = max(round(raw_gas / 10, 2), 0.0)
-
-                # Moving average smoothing
-                gas_buffer.append(gas_ppm_calibrated)
-                gas_smoothed = round(sum(gas_buffer) / len(gas_buffer), 2)
-
-            else:
+        # Everything the Arduino sent since the last pass, parsed in one go
+        read_at, lines = reader.read_lines()
+
+        readings = []
+        for line in lines:
+            try:
+                parsed = parse_reading(line)
+            except (ValueError, IndexError) as e:
+                parse_errors += 1
+                print("Parse error:", str(e), " Line:", line)
                 continue
+            if parsed is not None:
+                readings.append(parsed)
+                clock.observe(parsed[0], read_at)
+
+        for millis, pm25, gas_ppm in readings:
+            # ------------------------------
+            # Timestamp: when the reading arrived, not when it was read
+            # ------------------------------
+            arrived = clock.host_time(millis)
+
+            sample = sampler.add(arrived, pm25, gas_ppm)
+            if sample is None:
+                continue
+            _, pm25, gas_ppm, count = sample
 
-        except (ValueError, IndexError) as e:
-            print("Parse error:", str(e), " Line:", line)
-            continue
+            # Moving average smoothing
+            gas_buffer.append(gas_ppm)
+            gas_smoothed = round(sum(gas_buffer) / len(gas_buffer), 2)
 
-        # ------------------------------
-        # Timestamp
-        # ------------------------------
-        pc_time = time.strftime("%Y-%m-%d %H:%M:%S")
+            ts = local_seconds(arrived)
+            pc_time = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
 
-        # ------------------------------
-        # Write to CSV
-        # ------------------------------
-        with open(file_name, 'a', newline='') as f:
-            writer = csv.writer(f)
+            # ------------------------------
+            # Write to CSV
+            # ------------------------------
             writer.writerow([pc_time, pm25, gas_smoothed])
+            store.append(ts, pm25, gas_smoothed)
+            ring.publish(ts, pm25, gas_smoothed)
+            aggregator.add(ts, pm25, gas_smoothed)
 
-        # ------------------------------
-        # Print to console
-        # ------------------------------
-        print(f"[REAL] {pc_time} -> PM2.5: {pm25} µg/m³ | Gas: {gas_smoothed} ppm")
+            # ------------------------------
+            # Print to console
+            # ------------------------------
+            print(f"[REAL] {pc_time} -> PM2.5: {pm25} µg/m³ | Gas: {gas_smoothed} ppm ({count} readings)")
 
-        # Delay between readings
-        time.sleep(5)
+        if time.monotonic() - last_stats >= STATS_INTERVAL_S:
+            print(f"[WRITER] {writer.stats()}")
+            print(f"[SAMPLER] {sampler.stats()} parse_errors={parse_errors} max_backlog_bytes={reader.max_backlog}")
+            last_stats = time.monotonic()
 
 except KeyboardInterrupt:
     print("\nStopped logging.")
-    ser.close()
+finally:
+    close_all()
+    print(f"[WRITER] {writer.stats()}")
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import numpy as np
+
+from metrics import stage_timer
+
+# -------------------------
+# Timestamp helpers
+# -------------------------
+# Timestamps are the naive local "YYYY-MM-DD HH:MM:SS" strings written by
+# sensor_data.py; internally they are int64 seconds.
+
+
+def parse_timestamps(values):
+    arr = np.char.replace(np.asarray(values, dtype=str), " ", "T")
+    return arr.astype("datetime64[s]").astype(np.int64)
+
+
+def format_timestamps(seconds):
+    text = np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ").tolist()
+
+
+# -------------------------
+# Incrementally loaded series
+# -------------------------
+class SensorSeries:
+    """In-memory columns (timestamp, pm25, gas) of the sensor CSV.
+
+    Only bytes appended since the previous call are parsed, so refreshing is
+    proportional to new data, not to the size of the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._offset = 0
+        self._inode = None
+        self._n = 0
+        self._ts = np.empty(1024, dtype=np.int64)
+        self._pm25 = np.empty(1024, dtype=np.float64)
+        self._gas = np.empty(1024, dtype=np.float64)
+
+    def _append(self, ts, pm25, gas):
+        need = self._n + len(ts)
+        if need > len(self._ts):
+            cap = max(need, 2 * len(self._ts))
+            self._ts = np.resize(self._ts, cap)
+            self._pm25 = np.resize(self._pm25, cap)
+            self._gas = np.resize(self._gas, cap)
+        self._ts[self._n:need] = ts
+        self._pm25[self._n:need] = pm25
+        self._gas[self._n:need] = gas
+        self._n = need
+
+    def refresh(self):
+        with stage_timer("csv_history_refresh"):
+            self._refresh()
+
+    def _refresh(self):
+        st = os.stat(self.path)
+        with self._lock:
+            # Truncated or replaced file: start over
+            if st.st_size < self._offset or (self._inode is not None and st.st_ino != self._inode):
+                self._reset()
+            self._inode = st.st_ino
+            if st.st_size == self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+
+            # Leave a partially written last row for the next refresh
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                return
+            self._offset += end
+
+            stamps, pm25, gas = [], [], []
+            for line in chunk[:end].decode("utf-8", errors="ignore").splitlines():
+                parts = line.split(",")
+                if len(parts) < 3 or not parts[0][:1].isdigit():
+                    continue
+                try:
+                    p, g = float(parts[1]), float(parts[2])
+                except ValueError:
+                    continue
+                stamps.append(parts[0])
+                pm25.append(p)
+                gas.append(g)
+
+            if stamps:
+                self._append(parse_timestamps(stamps), pm25, gas)
+
+    def columns(self):
+        with self._lock:
+            n = self._n
+            return self._ts[:n], self._pm25[:n], self._gas[:n]
+
+
+# -------------------------
+# Downsampling
+# -------------------------
+def bucket_stats(ts, values, start, end, points):
+    """min/max/mean of `values` over `points` equal-width time buckets in [start, end].
+
+    `ts` must be sorted. Empty buckets are omitted.
+    """
+    edges = np.linspace(start, end + 1, points + 1)
+    bounds = np.searchsorted(ts, edges)
+    counts = np.diff(bounds)
+    nonempty = counts > 0
+    if not nonempty.any():
+        return {"timestamp": [], "min": [], "max": [], "mean": [], "count": []}
+
+    starts = bounds[:-1][nonempty]
+    counts = counts[nonempty]
+    segment = values[bounds[0]:bounds[-1]]
+    offsets = starts - bounds[0]
+
+    sums = np.add.reduceat(segment, offsets)
+    return {
+        "timestamp": format_timestamps(edges[:-1][nonempty]),
+        "min": np.round(np.minimum.reduceat(segment, offsets), 2).tolist(),
+        "max": np.round(np.maximum.reduceat(segment, offsets), 2).tolist(),
+        "mean": np.round(sums / counts, 2).tolist(),
+        "count": counts.tolist(),
+    }
+
+
+def lttb_indices(x, y, points):
+    """Largest-Triangle-Three-Buckets: indices of `points` representative samples."""
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    # Inner buckets cover x[1:n-1]; first and last points are always kept
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        areas = np.abs(
+            (x[prev] - avg_x) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y - y[prev])
+        )
+        prev = lo + int(np.argmax(areas))
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample(ts, columns, start, end, points, mode="minmax"):
+    """Return `columns` (name -> array) over [start, end] reduced to about `points` entries."""
+    lo, hi = np.searchsorted(ts, [start, end + 1])
+    ts = ts[lo:hi]
+    columns = {name: values[lo:hi] for name, values in columns.items()}
+
+    if mode == "lttb":
+        result = {}
+        for name, values in columns.items():
+            idx = lttb_indices(ts, values, points)
+            result[name] = {
+                "timestamp": format_timestamps(ts[idx]),
+                "value": np.round(values[idx], 2).tolist(),
+            }
+        return result
+
+    return {name: bucket_stats(ts, values, start, end, points) for name, values in columns.items()}
@@ -0,0 +1,329 @@
+"""Multi-device sensor ingestion: one reader thread per serial port.
+
+    python sensor_ingest.py --port default=COM7 --port roof=COM8
+    SENSOR_PORTS="default=COM7,roof=COM8" python sensor_ingest.py
+    python sensor_ingest.py --port a=/dev/pts/5 --settle 0     # pty stand-in (see sensor_simulator.py)
+
+Every reading is tagged with its device id and written to that device's
+series in the partitioned store (sensor_store/<device>/) and to a CSV: the
+primary device (first --port) keeps writing sensor_data.csv, which the API
+serves, and the others write sensor_data_<device>.csv. Rolling aggregates
+are kept per device and saved next to its store (see sensor_aggregates.py),
+and every reading is published to the device's shared-memory ring
+(sensor_shm.py) as soon as it is parsed.
+"""
+import argparse
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import serial
+
+from sensor_aggregates import StreamAggregator
+from sensor_sampling import parse_reading
+from sensor_shm import RingWriter, ring_path
+from sensor_store import SensorStore, local_seconds, store_path
+from sensor_writer import BufferedCSVWriter, close_on_exit
+
+# ------------------------------
+# Config
+# ------------------------------
+BAUD_RATE = int(os.environ.get("SENSOR_BAUD", "115200"))
+PRIMARY_CSV = "sensor_data.csv"
+CSV_FIELDS = ["timestamp", "pm25_ug_m3", "gas_ppm"]
+
+BACKOFF_INITIAL_S = 0.5
+BACKOFF_MAX_S = 30.0
+QUEUE_SIZE = 10000
+GAS_SMOOTHING = 5  # moving average over the last N gas readings, as in sensor_data.py
+
+
+# ------------------------------
+# Parsing (same calibration as sensor_data.py)
+# ------------------------------
+def parse_line(line):
+    """'millis,pm25,gas' from the Arduino -> (pm25, gas_ppm), or None for noise/boot text."""
+    parsed = parse_reading(line)
+    return None if parsed is None else parsed[1:]
+
+
+# ------------------------------
+# Per-port reader
+# ------------------------------
+class SerialReader(threading.Thread):
+    """Reads one port forever, reconnecting with exponential backoff.
+
+    Readings go to `out` as (device, ts, pm25, gas_smoothed); ts is naive
+    local seconds taken when the line arrived. The queue is never blocked on:
+    if the writer falls behind, readings are dropped and counted.
+    """
+
+    def __init__(self, device, port, out, baudrate=BAUD_RATE, settle_s=2.0,
+                 backoff_initial=BACKOFF_INITIAL_S, backoff_max=BACKOFF_MAX_S, open_fn=serial.serial_for_url):
+        super().__init__(name=f"serial-{device}", daemon=True)
+        self.device = device
+        self.port = port
+        self.out = out
+        self.baudrate = baudrate
+        self.settle_s = settle_s
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.open_fn = open_fn
+        self.stop_event = threading.Event()
+
+        self.gas_buffer = deque(maxlen=GAS_SMOOTHING)
+        self.connected = False
+        self.readings = 0
+        self.parse_errors = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.last_error = None
+        self.last_reading_at = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        delay = self.backoff_initial
+        while not self.stop_event.is_set():
+            try:
+                ser = self.open_fn(self.port, self.baudrate, timeout=1)
+            except (serial.SerialException, OSError) as e:
+                self._disconnected(e, delay)
+                delay = min(delay * 2, self.backoff_max)
+                continue
+
+            print(f"[{self.device}] connected on {self.port}")
+            self.connected = True
+            delay = self.backoff_initial
+            try:
+                # Opening the port resets the Arduino; give it time to boot
+                self.stop_event.wait(self.settle_s)
+                self._read_loop(ser)
+            except (serial.SerialException, OSError) as e:
+                self._disconnected(e, delay)
+                delay = min(delay * 2, self.backoff_max)
+            finally:
+                self.connected = False
+                try:
+                    ser.close()
+                except (serial.SerialException, OSError):
+                    pass
+
+    def _disconnected(self, error, delay):
+        self.connected = False
+        self.reconnects += 1
+        self.last_error = str(error)
+        # Jitter keeps several nodes on one flaky hub from retrying in lockstep
+        wait = delay * random.uniform(0.8, 1.2)
+        print(f"[{self.device}] {self.port} unavailable ({error}); retrying in {wait:.1f} s")
+        self.stop_event.wait(wait)
+
+    def _read_loop(self, ser):
+        while not self.stop_event.is_set():
+            raw = ser.readline()
+            if not raw:
+                continue
+            line = raw.decode("utf-8", errors="ignore").strip()
+            try:
+                parsed = parse_line(line)
+            except (ValueError, IndexError):
+                self.parse_errors += 1
+                continue
+            if parsed is None:
+                continue
+
+            pm25, gas_ppm = parsed
+            self.gas_buffer.append(gas_ppm)
+            gas_smoothed = round(sum(self.gas_buffer) / len(self.gas_buffer), 2)
+            self.emit(local_seconds(), pm25, gas_smoothed)
+
+    def emit(self, ts, pm25, gas):
+        try:
+            self.out.put_nowait((self.device, ts, pm25, gas))
+            self.readings += 1
+            self.last_reading_at = time.time()
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            "port": self.port,
+            "connected": self.connected,
+            "readings": self.readings,
+            "parse_errors": self.parse_errors,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "seconds_since_reading": round(time.time() - self.last_reading_at, 1) if self.last_reading_at else None,
+        }
+
+
+# ------------------------------
+# Shared writer
+# ------------------------------
+def csv_path(device, primary):
+    return PRIMARY_CSV if device == primary else f"sensor_data_{device}.csv"
+
+
+class IngestWriter(threading.Thread):
+    """Single consumer: appends every device's readings to its store series, aggregates and CSV."""
+
+    def __init__(self, readings, devices, primary, store_root=None, **writer_options):
+        super().__init__(name="sensor-writer", daemon=True)
+        self.readings = readings
+        # writer=True: raises RuntimeError if another ingester already owns a device
+        self.stores = {d: SensorStore(store_path(d, store_root), writer=True) for d in devices}
+        self.aggregators = {d: StreamAggregator(store_path(d, store_root)) for d in devices}
+        self.rings = {d: RingWriter(ring_path(d, store_root)) for d in devices}
+        for d in devices:
+            self.rings[d].seed(self.stores[d])
+        self.writers = {
+            d: BufferedCSVWriter(
+                csv_path(d, primary),
+                header=CSV_FIELDS,
+                on_flush=lambda fsync, d=d: self._flushed(d, fsync),
+                **writer_options,
+            )
+            for d in devices
+        }
+        self.stop_event = threading.Event()
+        self.written = 0
+        self.errors = 0
+        self.last_error = None
+
+    def run(self):
+        while not (self.stop_event.is_set() and self.readings.empty()):
+            try:
+                device, ts, pm25, gas = self.readings.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self._write(device, ts, pm25, gas)
+            except Exception as e:
+                # One bad record must not stop the only consumer of the queue
+                self.errors += 1
+                self.last_error = f"{device}: {e}"
+                print(f"[WRITER] failed to write reading from {device}: {e}")
+
+    def _write(self, device, ts, pm25, gas):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+        self.writers[device].writerow([stamp, pm25, gas])
+        self.stores[device].append(ts, pm25, gas)
+        self.rings[device].publish(ts, pm25, gas)
+        self.aggregators[device].add(ts, pm25, gas)
+        self.written += 1
+
+    def _flushed(self, device, fsync):
+        # Store and aggregates follow the CSV's flush schedule
+        self.stores[device].flush(fsync=fsync)
+        self.aggregators[device].save()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def close(self):
+        self.stop()
+        if self.is_alive():
+            self.join(timeout=5)
+        for device, writer in self.writers.items():
+            writer.close()
+            self.stores[device].close()
+            self.aggregators[device].close()
+            self.rings[device].close()
+
+
+# ------------------------------
+# Service
+# ------------------------------
+class IngestService:
+    def __init__(self, ports, primary=None, baudrate=BAUD_RATE, settle_s=2.0, store_root=None, **writer_options):
+        self.readings = queue.Queue(maxsize=QUEUE_SIZE)
+        devices = list(ports)
+        self.primary = primary or devices[0]
+        self.readers = [
+            SerialReader(device, port, self.readings, baudrate=baudrate, settle_s=settle_s)
+            for device, port in ports.items()
+        ]
+        self.writer = IngestWriter(self.readings, devices, self.primary, store_root=store_root, **writer_options)
+
+    def start(self):
+        self.writer.start()
+        for reader in self.readers:
+            reader.start()
+
+    def close(self):
+        for reader in self.readers:
+            reader.stop()
+        for reader in self.readers:
+            reader.join(timeout=3)
+        self.writer.close()
+
+    def stats(self):
+        return {
+            "queued": self.readings.qsize(),
+            "written": self.writer.written,
+            "write_errors": self.writer.errors,
+            "last_write_error": self.writer.last_error,
+            "devices": {r.device: r.stats() for r in self.readers},
+            "writers": {d: w.stats() for d, w in self.writer.writers.items()},
+        }
+
+
+def parse_ports(values):
+    """['roof=COM8', 'COM7'] -> {'roof': 'COM8', 'default': 'COM7'}"""
+    ports = {}
+    for value in values:
+        for item in filter(None, (v.strip() for v in value.split(","))):
+            device, sep, port = item.partition("=")
+            if not sep:
+                device, port = "default", item
+            if device in ports:
+                raise SystemExit(f"Device id used twice: {device}")
+            ports[device] = port
+    return ports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", action="append", default=[], help="device=PORT (repeatable, or comma separated)")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait after opening a port")
+    parser.add_argument("--stats-interval", type=float, default=60.0)
+    parser.add_argument("--flush-rows", type=int, default=int(os.environ.get("SENSOR_CSV_FLUSH_ROWS", "64")))
+    parser.add_argument("--flush-seconds", type=float, default=float(os.environ.get("SENSOR_CSV_FLUSH_S", "1")))
+    parser.add_argument("--fsync", default=os.environ.get("SENSOR_CSV_FSYNC", "interval"), choices=["always", "interval", "never"])
+    args = parser.parse_args()
+
+    ports = parse_ports(args.port or [os.environ.get("SENSOR_PORTS", "default=COM7")])
+    try:
+        service = IngestService(
+            ports,
+            baudrate=args.baud,
+            settle_s=args.settle,
+            max_rows=args.flush_rows,
+            max_delay_s=args.flush_seconds,
+            fsync=args.fsync,
+        )
+    except RuntimeError as e:
+        # Another ingester (or sensor_data.py) already writes one of these devices
+        raise SystemExit(f"Error: {e}")
+    close_on_exit(service)
+    service.start()
+    print(f"Ingesting {len(ports)} device(s): {ports} (primary: {service.primary}). Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            print(f"[INGEST] {service.stats()}")
+    except KeyboardInterrupt:
+        print("\nStopping ingestion.")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+# -------------------------
+# Config / Paths
+# -------------------------
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Models")
+SENSOR_MODEL_PATH = os.environ.get("SENSOR_MODEL_PATH", os.path.join(MODELS_DIR, "aqi_model.pkl"))
+SENSOR_SCALER_PATH = os.environ.get("SENSOR_SCALER_PATH", os.path.join(MODELS_DIR, "scaler.pkl"))
+# Optional: used for the class and probabilities when present, otherwise the regressor's tree votes are
+SENSOR_CLASS_MODEL_PATH = os.environ.get("SENSOR_CLASS_MODEL_PATH", os.path.join(MODELS_DIR, "aqi_class_model.pkl"))
+
+# Lookup-grid surrogate exported by Models/aqiGrid.py; used instead of the forests when set
+SENSOR_MODEL_GRID = os.environ.get("SENSOR_MODEL_GRID", "")
+SENSOR_MODEL_GRID_MODE = os.environ.get("SENSOR_MODEL_GRID_MODE", "")  # override the export's mode
+GRID_MODES = ("nearest", "linear")
+
+# Up to this many rows, all trees are walked in lock-step; above it each tree's own
+# (Cython) predict runs once over the whole batch and its output is folded into
+# running sums, so memory stays (rows x classes) rather than (rows x trees)
+LOCKSTEP_MAX_ROWS = 512
+
+# The sensor CSV has no temperature column; used when a request doesn't supply one
+DEFAULT_TEMPERATURE_C = float(os.environ.get("DEFAULT_TEMPERATURE_C", "25"))
+
+# -------------------------
+# AQI classes
+# -------------------------
+# Same breakpoints as aqi_to_class() in Models/sensorModel.py, lowest first
+AQI_BREAKPOINTS = np.array([50, 100, 150, 200, 300])
+AQI_CLASSES = [
+    "Good",
+    "Moderate",
+    "Unhealthy for Sensitive Groups",
+    "Unhealthy",
+    "Very Unhealthy",
+    "Severe",
+]
+
+
+def aqi_to_class(aqi):
+    return AQI_CLASSES[int(np.searchsorted(AQI_BREAKPOINTS, aqi, side="left"))]
+
+
+# -------------------------
+# Compiled random forest
+# -------------------------
+class CompiledForest:
+    """A fitted sklearn forest (regressor or classifier) flattened into numpy arrays.
+
+    `RandomForestRegressor.predict` on a single row spends ~20 ms in
+    per-call validation and joblib dispatch. Here all trees are walked in
+    lock-step with one fancy-indexing step per depth level, which is well
+    under a millisecond for 200 trees and gives every tree's prediction
+    (used for the confidence), not just the mean. For a classifier each
+    leaf holds the tree's class probabilities, as in `predict_proba`.
+    Batches larger than `LOCKSTEP_MAX_ROWS` use `iter_trees`, which runs
+    each fitted tree's own predict over the whole batch, one tree at a time.
+    """
+
+    def __init__(self, forest):
+        self.estimators = list(forest.estimators_)
+        self.is_classifier = hasattr(forest, "classes_")
+        trees = [est.tree_ for est in self.estimators]
+        counts = np.array([t.node_count for t in trees])
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count) + offset
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Leaves point at themselves, so extra steps past a shallow leaf are no-ops
+            left.append(np.where(leaf, nodes, tree.children_left + offset))
+            right.append(np.where(leaf, nodes, tree.children_right + offset))
+            if self.is_classifier:
+                weights = tree.value[:, 0, :]
+                value.append(weights / weights.sum(axis=1, keepdims=True))
+            else:
+                value.append(tree.value[:, 0, 0])
+
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.value = np.concatenate(value)
+        self.roots = offsets.astype(np.intp)
+        self.max_depth = max(t.max_depth for t in trees)
+        self.n_features = forest.n_features_in_
+        self.classes = list(getattr(forest, "classes_", []))
+
+    def iter_trees(self, X):
+        """Each tree's predictions for all of X in turn: (n_samples,), or (n_samples, n_classes) for a classifier."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        for est in self.estimators:
+            yield est.predict_proba(X, check_input=False) if self.is_classifier else est.predict(X, check_input=False)
+
+    def predict_trees(self, X):
+        """(n_samples, n_trees) per-tree predictions, (n_samples, n_trees, n_classes) for a classifier.
+
+        Walks all trees in lock-step; meant for batches up to LOCKSTEP_MAX_ROWS.
+        """
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict(self, X):
+        """Mean over trees: the regression value, or class probabilities (columns in `classes` order)."""
+        if len(X) <= LOCKSTEP_MAX_ROWS:
+            return self.predict_trees(X).mean(axis=1)
+        return sum(self.iter_trees(X)) / len(self.estimators)
+
+
+# -------------------------
+# Sensor AQI model
+# -------------------------
+class SensorAQIModel:
+    """PM2.5 + temperature -> AQI, from the models trained by Models/sensorModel.py.
+
+    Loaded once and kept resident. `predict_batch` takes any number of
+    (PM2.5, TEMP) rows and returns every row's AQI, class and class
+    probabilities in one vectorized call. Without the classifier, the
+    probabilities are the share of the regressor's trees whose own
+    prediction falls in each AQI class.
+    """
+
+    def __init__(self, forest, scaler, classifier=None):
+        self.forest = CompiledForest(forest)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.classifier = None
+        if classifier is not None:
+            self.classifier = CompiledForest(classifier)
+            unknown = set(self.classifier.classes) - set(AQI_CLASSES)
+            if unknown:
+                raise ValueError(f"Classifier has labels outside AQI_CLASSES: {sorted(unknown)}")
+            # Classifier columns (sorted labels) -> AQI_CLASSES positions; absent classes stay 0
+            self._class_columns = (
+                [AQI_CLASSES.index(name) for name in self.classifier.classes],
+                list(range(len(self.classifier.classes))),
+            )
+
+    def _regress(self, x):
+        # (aqi, tree-vote probabilities or None) for standardized rows
+        votes_needed = self.classifier is None
+        n_classes, n_trees = len(AQI_CLASSES), len(self.forest.estimators)
+        if len(x) <= LOCKSTEP_MAX_ROWS:
+            per_tree = self.forest.predict_trees(x)
+            if not votes_needed:
+                return per_tree.mean(axis=1), None
+            votes = np.searchsorted(AQI_BREAKPOINTS, per_tree, side="left")
+            rows = np.arange(len(x))[:, None] * n_classes
+            counts = np.bincount((votes + rows).ravel(), minlength=len(x) * n_classes)
+            return per_tree.mean(axis=1), counts.reshape(len(x), n_classes) / n_trees
+
+        total = np.zeros(len(x))
+        # above[k]: trees whose AQI is past breakpoint k (a few vector compares per tree,
+        # far cheaper than a searchsorted + scatter-add per tree)
+        above = np.zeros((len(AQI_BREAKPOINTS), len(x)), dtype=np.int32)
+        for tree_aqi in self.forest.iter_trees(x):
+            total += tree_aqi
+            if votes_needed:
+                for k, breakpoint in enumerate(AQI_BREAKPOINTS):
+                    above[k] += tree_aqi > breakpoint
+        if not votes_needed:
+            return total / n_trees, None
+        counts = np.vstack([n_trees - above[:1], above[:-1] - above[1:], above[-1:]]).T
+        return total / n_trees, counts / n_trees
+
+    def predict_batch(self, X):
+        """X: (n, 2) array of (PM2.5, TEMP) rows.
+
+        Returns arrays: "aqi" (n,), "predicted_class" (n,), "confidence" (n,)
+        and "probabilities" (n, len(AQI_CLASSES)).
+        """
+        X = (_feature_rows(X) - self.mean) / self.scale
+        aqi, probabilities = self._regress(X)
+        if self.classifier is not None:
+            probabilities = np.zeros((len(X), len(AQI_CLASSES)))
+            dst, src = self._class_columns
+            probabilities[:, dst] = self.classifier.predict(X)[:, src]
+            predicted = probabilities.argmax(axis=1)
+        else:
+            predicted = np.searchsorted(AQI_BREAKPOINTS, aqi, side="left")
+        return _batch_result(aqi, probabilities, predicted)
+
+    def predict(self, pm25, temperature):
+        return _first_row(self.predict_batch([[pm25, temperature]]))
+
+
+def _feature_rows(X):
+    # (n, 2) float rows; NaN / inf would index the grid out of bounds and mean nothing to the trees
+    X = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+    if not np.isfinite(X).all():
+        raise ValueError("PM2.5 and temperature must be finite numbers")
+    return X
+
+
+def _batch_result(aqi, probabilities, predicted):
+    return {
+        "aqi": aqi,
+        "predicted_class": np.asarray(AQI_CLASSES)[predicted],
+        "confidence": probabilities[np.arange(len(aqi)), predicted],
+        "probabilities": probabilities,
+    }
+
+
+def _first_row(batch):
+    return {
+        "aqi": round(float(batch["aqi"][0]), 1),
+        "predicted_class": str(batch["predicted_class"][0]),
+        "confidence": float(batch["confidence"][0]),
+        "probabilities": dict(zip(AQI_CLASSES, batch["probabilities"][0].tolist())),
+    }
+
+
+# -------------------------
+# Lookup-grid surrogate
+# -------------------------
+class GridAQIModel:
+    """The sensor model's outputs precomputed over a PM2.5 x TEMP grid (see Models/aqiGrid.py).
+
+    `values[i, j]` holds the AQI followed by the class probabilities at
+    pm25 = start + i * step and temp = start + j * step, so a prediction
+    costs the same however many trees the forests have. "nearest" takes the
+    closest grid point, "linear" interpolates bilinearly; inputs outside the
+    grid are clamped to its edge. The export's measured error against the
+    forests is kept in `error`.
+    """
+
+    def __init__(self, values, meta, mode=None):
+        self.values = values
+        self.pm25_axis = meta["pm25"]  # [start, step, count]
+        self.temp_axis = meta["temp"]
+        self.mode = mode or meta.get("mode", "nearest")
+        if self.mode not in GRID_MODES:
+            raise ValueError(f"mode must be one of {GRID_MODES}, got {self.mode!r}")
+        self.votes = meta["class_source"] == "votes"
+        self.error = meta.get("error", {})
+
+    @classmethod
+    def load(cls, path, mode=None):
+        """Memory-maps `path` (.npy) and reads its `path`.json metadata."""
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["classes"] != AQI_CLASSES:
+            raise ValueError(f"{path} was exported for classes {meta['classes']}")
+        return cls(np.load(path, mmap_mode="r"), meta, mode)
+
+    @staticmethod
+    def _position(x, axis):
+        start, step, count = axis
+        return np.clip((x - start) / step, 0, count - 1)
+
+    def lookup(self, X):
+        """(n, 1 + len(AQI_CLASSES)) grid values at the (PM2.5, TEMP) rows of X (ValueError if any is non-finite)."""
+        X = _feature_rows(X)
+        p = self._position(X[:, 0], self.pm25_axis)
+        t = self._position(X[:, 1], self.temp_axis)
+        if self.mode == "nearest":
+            return np.asarray(self.values[np.rint(p).astype(np.intp), np.rint(t).astype(np.intp)], dtype=np.float64)
+
+        i = np.minimum(p.astype(np.intp), self.pm25_axis[2] - 2)
+        j = np.minimum(t.astype(np.intp), self.temp_axis[2] - 2)
+        fi = (p - i)[:, None]
+        fj = (t - j)[:, None]
+        v = self.values
+        low = v[i, j] * (1 - fi) + v[i + 1, j] * fi
+        high = v[i, j + 1] * (1 - fi) + v[i + 1, j + 1] * fi
+        return low * (1 - fj) + high * fj
+
+    def predict_batch(self, X):
+        """Same interface and output as SensorAQIModel.predict_batch."""
+        values = self.lookup(X)
+        aqi, probabilities = values[:, 0], values[:, 1:]
+        if self.votes:
+            predicted = np.searchsorted(AQI_BREAKPOINTS, aqi, side="left")
+        else:
+            predicted = probabilities.argmax(axis=1)
+        return _batch_result(aqi, probabilities, predicted)
+
+    def predict(self, pm25, temperature):
+        return _first_row(self.predict_batch([[pm25, temperature]]))
+
+
+def load_sensor_model(model_path=None, scaler_path=None, class_model_path=None, grid_path=None):
+    """SensorAQIModel from the pickles, or the GridAQIModel at `grid_path` / SENSOR_MODEL_GRID if set."""
+    start = time.perf_counter()
+    grid_path = SENSOR_MODEL_GRID if grid_path is None else grid_path
+    if grid_path:
+        model = GridAQIModel.load(grid_path, mode=SENSOR_MODEL_GRID_MODE or None)
+        model.load_ms = round((time.perf_counter() - start) * 1000.0, 1)
+        return model
+
+    with open(model_path or SENSOR_MODEL_PATH, "rb") as f:
+        forest = pickle.load(f)
+    with open(scaler_path or SENSOR_SCALER_PATH, "rb") as f:
+        scaler = pickle.load(f)
+    classifier = None
+    class_model_path = class_model_path or SENSOR_CLASS_MODEL_PATH
+    if os.path.isfile(class_model_path):
+        with open(class_model_path, "rb") as f:
+            classifier = pickle.load(f)
+    model = SensorAQIModel(forest, scaler, classifier)
+    model.load_ms = round((time.perf_counter() - start) * 1000.0, 1)
+    return model
+
+
+# -------------------------
+# Fusion
+# -------------------------
+def fuse_predictions(image_probabilities, sensor_probabilities, image_weight=0.5):
+    """Weighted average of the two class distributions (both keyed by class name)."""
+    fused = {
+        name: image_weight * image_probabilities.get(name, 0.0)
+        + (1.0 - image_weight) * sensor_probabilities.get(name, 0.0)
+        for name in AQI_CLASSES
+    }
+    predicted = max(fused, key=fused.get)
+    return {"predicted_class": predicted, "confidence": fused[predicted], "probabilities": fused}
@@ -0,0 +1,112 @@
+import os
+import threading
+
+from metrics import stage_timer
+
+# -------------------------
+# Tail-seek CSV reading
+# -------------------------
+TAIL_BLOCK_SIZE = 4096
+
+
+def read_last_line(path, block_size=TAIL_BLOCK_SIZE):
+    """Return the last complete line of `path` without reading the whole file.
+
+    Seeks backwards from the end in `block_size` steps, so the cost depends on
+    the length of the last line, not on the size of the file. A trailing line
+    without a newline is treated as a row still being written and skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end == 0:
+            return None
+
+        # Drop a partially written final row
+        f.seek(end - 1)
+        if f.read(1) not in (b"\n", b"\r"):
+            end = _previous_newline(f, end, block_size)
+            if end is None:
+                return None
+            end += 1
+
+        # Find the newline that terminates the row before the last one
+        data_end = end
+        while data_end > 0:
+            f.seek(data_end - 1)
+            if f.read(1) not in (b"\n", b"\r"):
+                break
+            data_end -= 1
+        if data_end == 0:
+            return None
+
+        start = _previous_newline(f, data_end, block_size)
+        start = 0 if start is None else start + 1
+        f.seek(start)
+        return f.read(data_end - start).decode("utf-8", errors="ignore")
+
+
+def _previous_newline(f, pos, block_size):
+    # Offset of the last b"\n" strictly before `pos`, or None
+    while pos > 0:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        idx = f.read(step).rfind(b"\n")
+        if idx != -1:
+            return pos + idx
+    return None
+
+
+def parse_sensor_row(line):
+    """Parse a `timestamp,pm25_ug_m3,gas_ppm` row.
+
+    Returns None for an empty file or the header row, raises ValueError for a
+    malformed row.
+    """
+    if not line:
+        return None
+    parts = line.strip().split(",")
+    if parts[0] == "timestamp":
+        return None
+    if len(parts) < 3:
+        raise ValueError("Malformed sensor data")
+    return {
+        "data_timestamp": parts[0],
+        "pm25": round(float(parts[1]), 1),
+        "mq135": round(float(parts[2]), 1),
+    }
+
+
+# -------------------------
+# mtime/size keyed cache
+# -------------------------
+class LatestReadingCache:
+    """Caches the parsed last row of a CSV, keyed on the file's mtime and size.
+
+    `get()` returns `(reading, etag)`; `reading` is None when the file has no
+    data rows. Raises FileNotFoundError if the file does not exist and
+    ValueError if the last row is malformed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._value = (None, None)
+        self._lock = threading.Lock()
+
+    def get(self):
+        st = os.stat(self.path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key == self._key:
+                return self._value
+
+        with stage_timer("csv_read"):
+            reading = parse_sensor_row(read_last_line(self.path))
+        etag = f'"{key[0]:x}-{key[1]:x}"'
+
+        with self._lock:
+            self._key = key
+            self._value = (reading, etag)
+        return reading, etag
@@ -0,0 +1,156 @@
+import math
+import time
+
+# ------------------------------
+# Parsing
+# ------------------------------
+def parse_reading(line):
+    """'millis,pm25,gas' from the Arduino -> (millis, pm25, gas_ppm), or None for noise/boot text.
+
+    Raises ValueError for a line that looks like data but doesn't parse,
+    including the `nan` / `inf` an Arduino prints for a failed sensor read.
+    """
+    if not line or not line[0].isdigit():
+        return None
+    parts = line.split(",")
+    if len(parts) != 3:
+        return None
+    values = [float(p) for p in parts]
+    if not all(math.isfinite(v) for v in values):
+        raise ValueError(f"non-finite value in {line!r}")
+    millis = values[0]
+    pm25 = max(round(values[1], 2), 0.0)
+    gas_ppm = max(round(values[2] / 10, 2), 0.0)  # calibration factor: divide by 10
+    return millis, pm25, gas_ppm
+
+
+# ------------------------------
+# Draining the serial buffer
+# ------------------------------
+class LineReader:
+    """Reads whatever the port has buffered in one call and splits it into lines.
+
+    Never sleeps between reads, so the OS buffer can't back up: each call
+    waits at most the port's timeout for the first byte, then takes the rest
+    of the buffer. A trailing partial line is kept for the next call.
+    """
+
+    def __init__(self, ser, max_line=256):
+        self.ser = ser
+        self.max_line = max_line
+        self._partial = b""
+        self.bytes_read = 0
+        self.max_backlog = 0  # largest OS buffer seen, bytes
+
+    def read_lines(self):
+        """(time.time() of the read, [complete lines])"""
+        waiting = self.ser.in_waiting
+        self.max_backlog = max(self.max_backlog, waiting)
+        data = self.ser.read(waiting or 1)
+        if data and not waiting:
+            data += self.ser.read(self.ser.in_waiting)
+        read_at = time.time()
+        if not data:
+            return read_at, []
+
+        self.bytes_read += len(data)
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        if len(self._partial) > self.max_line:
+            self._partial = b""  # no newline in sight: line noise
+        return read_at, [line.decode("utf-8", errors="ignore").strip() for line in lines]
+
+
+# ------------------------------
+# Arrival timestamps
+# ------------------------------
+class ArduinoClock:
+    """Maps the Arduino's millis() onto host time.
+
+    `read_at - millis / 1000` is smallest for the line that sat in buffers
+    the least, so the offset tracks the minimum of that, allowed to creep up
+    by `drift` seconds per second to follow a slow Arduino crystal. Observe
+    a whole bulk read before converting it, so a backlog's older lines are
+    placed by the newest one rather than all sharing the read's time. A
+    millis() that goes backwards (board reset, overflow) restarts the
+    estimate.
+    """
+
+    def __init__(self, drift=0.001):
+        self.drift = drift
+        self.offset = None
+        self.last_millis = None
+
+    def observe(self, millis, read_at):
+        observed = read_at - millis / 1000.0
+        if self.offset is None or millis < self.last_millis:
+            self.offset = observed
+        else:
+            creep = (millis - self.last_millis) / 1000.0 * self.drift
+            self.offset = min(self.offset + creep, observed)
+        self.last_millis = millis
+
+    def host_time(self, millis):
+        """time.time() at which the line stamped `millis` arrived."""
+        return self.offset + millis / 1000.0
+
+
+# ------------------------------
+# Adaptive decimation
+# ------------------------------
+class AdaptiveSampler:
+    """Averages raw readings into output samples at a rate that follows the data.
+
+    A window closes after `max_interval_s`, or as soon as `min_interval_s`
+    has passed and PM2.5 has moved by `pm25_delta` from the last output:
+    steady air gives one sample per max interval, a plume is logged at up
+    to one per min interval. `add()` returns (ts, pm25, gas, n) when a
+    window closes, with ts the arrival time of its last reading.
+    """
+
+    def __init__(self, min_interval_s=0.5, max_interval_s=5.0, pm25_delta=5.0):
+        self.min_interval = float(min_interval_s)
+        self.max_interval = max(float(max_interval_s), self.min_interval)
+        self.delta = float(pm25_delta)
+        self._last_output = None  # (ts, pm25)
+        self._reset()
+        self.readings = 0
+        self.samples = 0
+        self.fast_samples = 0
+
+    def _reset(self):
+        self._n = 0
+        self._pm25 = 0.0
+        self._gas = 0.0
+
+    def add(self, ts, pm25, gas):
+        self.readings += 1
+        self._n += 1
+        self._pm25 += pm25
+        self._gas += gas
+
+        if self._last_output is None:
+            return self._emit(ts)
+        elapsed = ts - self._last_output[0]
+        if elapsed >= self.max_interval:
+            return self._emit(ts)
+        if elapsed >= self.min_interval and abs(pm25 - self._last_output[1]) >= self.delta:
+            self.fast_samples += 1
+            return self._emit(ts)
+        return None
+
+    def _emit(self, ts):
+        n = self._n
+        pm25 = round(self._pm25 / n, 2)
+        gas = round(self._gas / n, 2)
+        self._reset()
+        self._last_output = (ts, pm25)
+        self.samples += 1
+        return ts, pm25, gas, n
+
+    def stats(self):
+        return {
+            "readings": self.readings,
+            "samples": self.samples,
+            "fast_samples": self.fast_samples,
+            "readings_per_sample": round(self.readings / self.samples, 1) if self.samples else 0.0,
+        }
@@ -0,0 +1,183 @@
+import mmap
+import os
+import random
+import struct
+import time
+
+from sensor_store import DEFAULT_DEVICE, WriterLock, store_path
+
+# -------------------------
+# Shared-memory ring of recent readings
+# -------------------------
+# One file, mapped by the ingest process (single writer) and the API (any
+# number of readers):
+#   header   magic, record size, capacity, epoch, seq   (64 bytes reserved)
+#   slots    capacity x record: slot seq, ts, pm25, gas, published
+#
+# `seq` counts published readings; reading n lives in slot (n - 1) % capacity.
+# Each slot is a seqlock: the writer sets its slot seq to 2n - 1, writes the
+# fields, then sets it to 2n, and only then bumps the header seq. A reader
+# accepts a slot only if it sees 2n both before and after reading the fields,
+# so it never takes a lock and never returns a torn record. `epoch` is random
+# per ring initialization and goes into the ETag.
+#
+# The file lives in the device's store directory by default; point
+# SENSOR_RING_DIR at a tmpfs (e.g. /dev/shm) to keep it off disk entirely.
+# Either way readers are served from the page cache, never from disk.
+MAGIC = b"ENVRING1"
+RETIRED = b"RETIRED\0"
+HEADER = struct.Struct("<8sIIQQ")
+HEADER_SIZE = 64
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 24  # of the header's seq field
+RECORD = struct.Struct("<Qdddd")
+
+RING_CAPACITY = int(os.environ.get("SENSOR_RING_CAPACITY", "1024"))
+SENSOR_RING_DIR = os.environ.get("SENSOR_RING_DIR")
+RING_FILE = "latest.ring"
+READ_RETRIES = 4
+
+
+def ring_path(device=DEFAULT_DEVICE, root=None):
+    if SENSOR_RING_DIR and root is None:
+        return os.path.join(SENSOR_RING_DIR, f"{device}.ring")
+    return os.path.join(store_path(device, root), RING_FILE)
+
+
+def _ring_size(capacity):
+    return HEADER_SIZE + capacity * RECORD.size
+
+
+class RingWriter:
+    """Publishes readings into the ring; there must be only one per file.
+
+    Holds `<path>.lock` while open, so a second writer raises RuntimeError.
+
+    An existing ring with the same layout is reused, so readers keep the
+    last readings across an ingest restart. Otherwise a new file replaces it
+    and the old one is marked retired so mapped readers reopen.
+    """
+
+    def __init__(self, path, capacity=RING_CAPACITY):
+        self.path = path
+        self.capacity = max(1, int(capacity))
+        size = _ring_size(self.capacity)
+        self._lock = WriterLock(path + ".lock")
+
+        if not self._reusable(size):
+            self._retire()
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(HEADER.pack(MAGIC, RECORD.size, self.capacity, random.getrandbits(63), 0))
+                f.truncate(size)
+            os.replace(tmp, path)
+
+        self._file = open(path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self.seq = HEADER.unpack_from(self._mm, 0)[4]
+
+    def _reusable(self, size):
+        try:
+            with open(self.path, "rb") as f:
+                magic, record_size, capacity, _, _ = HEADER.unpack(f.read(HEADER.size))
+                return (magic, record_size, capacity) == (MAGIC, RECORD.size, self.capacity) and \
+                    os.fstat(f.fileno()).st_size == size
+        except (OSError, struct.error):
+            return False
+
+    def _retire(self):
+        try:
+            with open(self.path, "r+b") as f:
+                f.write(RETIRED)
+        except OSError:
+            pass
+
+    def publish(self, ts, pm25, gas):
+        n = self.seq + 1
+        offset = HEADER_SIZE + (n - 1) % self.capacity * RECORD.size
+        SEQ.pack_into(self._mm, offset, 2 * n - 1)
+        RECORD.pack_into(self._mm, offset, 2 * n - 1, ts, pm25, gas, time.time())
+        SEQ.pack_into(self._mm, offset, 2 * n)
+        SEQ.pack_into(self._mm, SEQ_OFFSET, n)
+        self.seq = n
+
+    def seed(self, store):
+        """Publish the store's newest reading into an empty ring (e.g. a tmpfs ring after a reboot)."""
+        if self.seq == 0:
+            latest = store.latest()
+            if latest is not None:
+                self.publish(float(latest["ts"]), float(latest["pm25"]), float(latest["gas"]))
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+        self._lock.close()
+
+
+class RingReader:
+    """Lock-free reads of the ring from another process.
+
+    Returns None (so the caller can fall back to the CSV / store) while the
+    ring file doesn't exist or has nothing in it yet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._mm = None
+        self.capacity = 0
+
+    def _open(self):
+        try:
+            self._file = open(self.path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, record_size, self.capacity, _, _ = HEADER.unpack_from(self._mm, 0)
+        except (OSError, ValueError, struct.error):
+            self.close()
+            return False
+        if magic != MAGIC or record_size != RECORD.size or len(self._mm) < _ring_size(self.capacity):
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+        self._mm = self._file = None
+
+    def _slot(self, n):
+        # The record of reading n, or None if the writer has overwritten or is writing it
+        offset = HEADER_SIZE + (n - 1) % self.capacity * RECORD.size
+        seq, ts, pm25, gas, published = RECORD.unpack_from(self._mm, offset)
+        if seq != 2 * n or SEQ.unpack_from(self._mm, offset)[0] != seq:
+            return None
+        return {"seq": n, "ts": ts, "pm25": pm25, "gas": gas, "published": published}
+
+    def latest(self):
+        """(newest record, (epoch, seq)) or None."""
+        if self._mm is None and not self._open():
+            return None
+        for _ in range(READ_RETRIES):
+            magic, _, _, epoch, seq = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                self.close()  # retired by a new writer; reopen on the next call
+                return None
+            if seq == 0:
+                return None
+            record = self._slot(seq)
+            if record is not None:
+                return record, (epoch, seq)
+        return None
+
+    def recent(self, count):
+        """Up to `count` newest records, oldest first."""
+        if self._mm is None and not self._open():
+            return []
+        seq = HEADER.unpack_from(self._mm, 0)[4]
+        first = max(1, seq - min(count, self.capacity) + 1)
+        records = (self._slot(n) for n in range(first, seq + 1))
+        return [r for r in records if r is not None]
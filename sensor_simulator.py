@@ -0,0 +1,424 @@
+"""Simulated Arduino sensor nodes on pseudo-terminals, for load-testing ingestion and the API.
+
+    # 4 virtual devices at 1000 lines/s each; prints the pty paths to give sensor_ingest.py
+    python sensor_simulator.py --devices 4 --rate 1000
+
+    # Replay sensor_data.csv at 1000x real time, with 1% malformed lines and 1% noise
+    python sensor_simulator.py --replay sensor_data.csv --speed 1000 --error-rate 0.01 --noise-rate 0.01
+
+    # Self-contained max-rate test: runs the ingest service in-process against the ptys
+    python sensor_simulator.py --devices 8 --rate 10000 --duration 10 --run-ingest --json ingest.json
+
+    # End-to-end latency (line written -> visible on /api/sensor-data); ingest must write
+    # to the server's sensor_data.csv, e.g. --run-ingest --out-dir .
+    python sensor_simulator.py --devices 1 --rate 5 --run-ingest --out-dir . --api http://localhost:8000
+
+Lines use the Arduino wire format `millis,pm25,gas` (raw gas, i.e. before the
+/10 calibration). POSIX only: on Windows use a virtual COM port pair (e.g.
+com0com) instead of ptys. The --api latency probe needs httpx.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+# ------------------------------
+# Line sources
+# ------------------------------
+MARKER_BASE = 1000.0  # PM2.5 values >= this are latency probes, never produced otherwise
+
+
+def replay_rows(path):
+    """(offset_s, pm25, raw_gas) from a sensor_data.csv, offsets relative to the first row."""
+    rows = []
+    first = None
+    with open(path, newline="") as f:
+        for record in csv.reader(f):
+            if len(record) < 3 or not record[0][:1].isdigit():
+                continue
+            try:
+                ts = time.mktime(time.strptime(record[0], "%Y-%m-%d %H:%M:%S"))
+                pm25, gas = float(record[1]), float(record[2])
+            except ValueError:
+                continue
+            first = ts if first is None else first
+            # The CSV holds calibrated ppm; the wire carries the raw value
+            rows.append((ts - first, min(pm25, MARKER_BASE - 1), gas * 10))
+    if not rows:
+        raise SystemExit(f"No readable rows in {path}")
+    return rows
+
+
+class SyntheticSource:
+    """Bounded random walk for PM2.5 and raw gas."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.pm25 = self.rng.uniform(5, 80)
+        self.gas = self.rng.uniform(500, 3000)
+
+    def next(self):
+        self.pm25 = min(max(self.pm25 + self.rng.gauss(0, 2), 0.0), 500.0)
+        self.gas = min(max(self.gas + self.rng.gauss(0, 25), 50.0), 9000.0)
+        return round(self.pm25, 2), round(self.gas, 1)
+
+
+# Lines the ingest parser rejects as errors (counted in its parse_errors)...
+MALFORMED = ["{},abc,12", "{},,", "{},12.5,", "{},nan,500", "{},12.5,inf"]
+# ...and lines it skips silently as boot text / line noise
+NOISE = ["{}", "{},1.5", "BOOT v1.{}", "{},12.5,1,2"]
+
+
+# ------------------------------
+# One virtual device
+# ------------------------------
+class VirtualDevice(threading.Thread):
+    """Writes wire-format lines to the master side of a pty.
+
+    Values come from `replay` rows or a synthetic random walk. Pacing:
+    `rate` lines/s, or (replay only) the CSV timestamps divided by `speed`. Lines
+    that fall due together are written in one os.write. If the reader can't
+    keep up, the pty buffer fills and writes block, so the achieved rate is
+    what the other end really sustained.
+    """
+
+    def __init__(self, name, rate=None, speed=None, replay=None, error_rate=0.0, noise_rate=0.0, limit=None, seed=0):
+        super().__init__(name=f"sim-{name}", daemon=True)
+        import pty
+        import tty
+
+        self.device = name
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+
+        self.rate = rate
+        self.speed = speed
+        self.replay = replay
+        self.error_rate = error_rate
+        self.noise_rate = noise_rate
+        self.limit = limit
+        self.source = SyntheticSource(seed)
+        self.rng = random.Random(seed + 1)
+        self.stop_event = threading.Event()
+
+        self.marker = None          # pm25 value to send on the next line
+        self.marker_sent = {}       # marker value -> perf_counter when written
+        # Set after a marker line: the device pauses so the marker stays the latest reading
+        self.hold = threading.Event()
+        self.sent = 0
+        self.malformed = 0
+        self.noise = 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+
+    def _due(self, elapsed):
+        if self.rate is None:
+            # Lines whose (scaled) replay offset has passed; wraps around at the end
+            n = len(self.replay)
+            loops, idx = divmod(self.sent, n)
+            span = self.replay[-1][0] + 1.0
+            due = self.sent
+            while True:
+                offset = (loops * span + self.replay[idx][0]) / self.speed
+                if offset > elapsed:
+                    return due
+                due += 1
+                idx += 1
+                if idx == n:
+                    idx, loops = 0, loops + 1
+                if due - self.sent >= 10000:
+                    return due
+        return int(elapsed * self.rate) + 1
+
+    def _line(self, seq):
+        millis = int((time.perf_counter() - self.started) * 1000)
+        if self.error_rate or self.noise_rate:
+            r = self.rng.random()
+            if r < self.error_rate:
+                self.malformed += 1
+                return self.rng.choice(MALFORMED).format(millis)
+            if r < self.error_rate + self.noise_rate:
+                self.noise += 1
+                return self.rng.choice(NOISE).format(millis)
+        if self.replay is not None:
+            _, pm25, gas = self.replay[seq % len(self.replay)]
+        else:
+            pm25, gas = self.source.next()
+        if self.marker is not None:
+            pm25, self.marker = self.marker, None
+            self.marker_sent[pm25] = time.perf_counter()
+            self.hold.set()
+        return f"{millis},{pm25},{gas}"
+
+    def release(self, held_since):
+        # Shift the pacing clock so the pause isn't made up with a burst
+        self.started += time.perf_counter() - held_since
+        self.hold.clear()
+
+    def run(self):
+        self.started = time.perf_counter()
+        while not self.stop_event.is_set():
+            if self.limit is not None and self.sent >= self.limit:
+                break
+            due = self._due(time.perf_counter() - self.started)
+            if self.limit is not None:
+                due = min(due, self.limit)
+            if due <= self.sent or self.hold.is_set():
+                time.sleep(0.0005)
+                continue
+            lines = []
+            for seq in range(self.sent, due):
+                lines.append(self._line(seq) + "\r\n")
+                if self.hold.is_set():
+                    break
+            data = "".join(lines).encode()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.master, view):]
+            self.bytes += len(data)
+            self.sent += len(lines)
+        self.finished = time.perf_counter()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def stats(self):
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "pty": self.path,
+            "sent": self.sent,
+            "malformed": self.malformed,
+            "noise": self.noise,
+            "bytes": self.bytes,
+            "achieved_lines_per_s": round(self.sent / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+# ------------------------------
+# End-to-end latency probe
+# ------------------------------
+class LatencyProbe(threading.Thread):
+    """Sends a marker reading every `every` seconds and polls the API until it shows up.
+
+    The device holds back further lines until then, since /api/sensor-data
+    only ever shows the latest reading.
+    """
+
+    def __init__(self, device, api_url, every=1.0, poll=0.01, timeout=30.0):
+        super().__init__(name="latency-probe", daemon=True)
+        self.device = device
+        self.url = api_url.rstrip("/") + "/api/sensor-data"
+        self.every = every
+        self.poll = poll
+        self.timeout = timeout
+        self.stop_event = threading.Event()
+        self.latencies_ms = []
+        self.lost = 0
+
+    def run(self):
+        import httpx
+
+        with httpx.Client(timeout=5.0) as client:
+            k = 0
+            while not self.stop_event.is_set():
+                k += 1
+                # Whole numbers: the API rounds pm25 to one decimal
+                self.device.marker = float(MARKER_BASE + k % 100000)
+                while not self.device.hold.is_set() and not self.stop_event.is_set():
+                    time.sleep(0.0005)
+                held_since = time.perf_counter()
+                deadline = held_since + self.timeout
+                seen = False
+                while not self.stop_event.is_set() and time.perf_counter() < deadline:
+                    try:
+                        pm25 = client.get(self.url).json().get("pm25")
+                    except (httpx.HTTPError, ValueError):
+                        pm25 = None
+                    sent_at = self.device.marker_sent.get(pm25)
+                    if sent_at is not None:
+                        self.latencies_ms.append((time.perf_counter() - sent_at) * 1000.0)
+                        seen = True
+                        break
+                    time.sleep(self.poll)
+                if not seen and not self.stop_event.is_set():
+                    self.lost += 1
+                self.device.release(held_since)
+                self.stop_event.wait(self.every)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        values = sorted(self.latencies_ms)
+        if not values:
+            return {"samples": 0, "lost": self.lost}
+
+        def pct(q):
+            return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+        return {
+            "samples": len(values),
+            "lost": self.lost,
+            "mean_ms": round(statistics.mean(values), 1),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(values[-1], 1),
+        }
+
+
+# ------------------------------
+# Main
+# ------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1, help="number of virtual devices")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--rate", type=float, help="lines per second per device (default 1, or replay timing with --replay)")
+    pacing.add_argument("--speed", type=float, help="replay speed-up factor, e.g. 1000")
+    parser.add_argument("--replay", help="sensor_data.csv to replay instead of synthetic readings")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of malformed lines (ingest parse errors)")
+    parser.add_argument("--noise-rate", type=float, default=0.0, help="share of boot-text / noise lines (skipped silently)")
+    parser.add_argument("--lines", type=int, help="stop each device after this many lines")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--run-ingest", action="store_true", help="run sensor_ingest in-process on the ptys")
+    parser.add_argument("--out-dir", help="where --run-ingest writes CSVs and the store (default: a temp dir)")
+    parser.add_argument("--api", help="server URL; measures line-written -> /api/sensor-data latency on device 0")
+    parser.add_argument("--probe-every", type=float, default=1.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not hasattr(os, "openpty"):
+        raise SystemExit("ptys are not available on this platform; use a virtual COM port pair instead")
+
+    replay = replay_rows(args.replay) if args.replay else None
+    if args.speed and replay is None:
+        raise SystemExit("--speed needs --replay; use --rate for synthetic readings")
+    # Replay follows the CSV timestamps (x --speed) unless --rate is given
+    rate = args.rate if args.rate or replay is None else None
+    if rate is None and replay is None:
+        rate = 1.0
+
+    devices = [
+        VirtualDevice(
+            "default" if i == 0 else f"sim{i}",
+            rate=rate,
+            speed=args.speed or 1.0,
+            replay=replay,
+            error_rate=args.error_rate,
+            noise_rate=args.noise_rate,
+            limit=args.lines,
+            seed=i,
+        )
+        for i in range(args.devices)
+    ]
+
+    args_json = args.json and os.path.abspath(args.json)
+    service = None
+    if args.run_ingest:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from sensor_ingest import IngestService
+
+        out_dir = args.out_dir
+        if not out_dir:
+            import tempfile
+            out_dir = tempfile.mkdtemp(prefix="sensor-sim-")
+        os.makedirs(out_dir, exist_ok=True)
+        os.chdir(out_dir)
+        service = IngestService(
+            {d.device: d.path for d in devices},
+            settle_s=0,
+            store_root=os.path.join(out_dir, "sensor_store"),
+            max_rows=512,
+            max_delay_s=float(os.environ.get("SENSOR_CSV_FLUSH_S", "0.2")),
+            fsync=os.environ.get("SENSOR_CSV_FSYNC", "never"),
+        )
+        service.start()
+        print(f"Ingest running in-process, writing to {out_dir}")
+    else:
+        ports = ",".join(f"{d.device}={d.path}" for d in devices)
+        print(f"Virtual devices ready. Start the reader with:\n  python sensor_ingest.py --settle 0 --port {ports}")
+
+    probe = LatencyProbe(devices[0], args.api, every=args.probe_every) if args.api else None
+
+    start = time.perf_counter()
+    for d in devices:
+        d.start()
+    if probe is not None:
+        probe.start()
+
+    try:
+        while any(d.is_alive() for d in devices):
+            if args.duration and time.perf_counter() - start >= args.duration:
+                break
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+
+    elapsed = time.perf_counter() - start
+    for d in devices:
+        d.stop()
+    for d in devices:
+        d.join(timeout=5)
+    if probe is not None:
+        probe.stop()
+        probe.join(timeout=5)
+
+    results = {
+        "elapsed_s": round(elapsed, 3),
+        "devices": {d.device: d.stats() for d in devices},
+        "sent": sum(d.sent for d in devices),
+        "malformed": sum(d.malformed for d in devices),
+        "noise": sum(d.noise for d in devices),
+    }
+    results["sent_lines_per_s"] = round(results["sent"] / elapsed, 1)
+
+    if service is not None:
+        # Let the readers drain what is still in the pty buffers
+        deadline = time.perf_counter() + 5
+        expected = results["sent"] - results["malformed"] - results["noise"]
+        while time.perf_counter() < deadline and sum(r.readings + r.dropped for r in service.readers) < expected:
+            time.sleep(0.05)
+        service.close()
+        stats = service.stats()
+        ingested = stats["written"]
+        parse_errors = sum(s["parse_errors"] for s in stats["devices"].values())
+        results["ingest"] = {
+            "written": ingested,
+            "written_per_s": round(ingested / elapsed, 1),
+            "parse_errors": parse_errors,
+            # Malformed lines sent but not reported as parse errors (negative: extra errors)
+            "parse_errors_missed": results["malformed"] - parse_errors,
+            "dropped": sum(s["dropped"] for s in stats["devices"].values()),
+            "missing": expected - ingested,
+            "devices": stats["devices"],
+        }
+    if probe is not None:
+        results["api_latency"] = probe.stats()
+
+    for d in devices:
+        d.close()
+
+    print(json.dumps({k: v for k, v in results.items() if k != "devices"}, indent=2))
+    if args_json:
+        with open(args_json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+import calendar
+import glob
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# -------------------------
+# Time-partitioned sensor store
+# -------------------------
+# Layout of a series directory (one per device):
+#   2025-09-03.seg        active day: fixed-width 16-byte records, append-only
+#   2025-09-02.segz       closed day: zlib-compressed columnar blocks
+#   2025-09-02.segz.idx   sparse index, one entry per block (first/last ts, offset, length, count)
+#   2025-09-03.seg.unordered  marker: the active day's timestamps went backwards
+#
+# Timestamps are float seconds of the naive local wall clock (the same clock
+# as the "YYYY-MM-DD HH:MM:SS" strings in sensor_data.csv), so a segment
+# holds exactly one local calendar day. That clock can step back (NTP, DST
+# fall-back): compressed segments are always sorted, and a raw segment with
+# the marker is scanned in full instead of binary-searched.
+RECORD = np.dtype([("ts", "<f8"), ("pm25", "<f4"), ("gas", "<f4")])
+BLOCK_INDEX = np.dtype([
+    ("first_ts", "<f8"), ("last_ts", "<f8"),
+    ("offset", "<i8"), ("length", "<i8"), ("count", "<i8"),
+])
+DAY = 86400
+BLOCK_RECORDS = 4096
+UNORDERED_SUFFIX = ".unordered"
+WRITER_LOCK = "writer.lock"
+
+SENSOR_STORE_DIR = os.environ.get("SENSOR_STORE_DIR", "sensor_store")
+DEFAULT_DEVICE = "default"
+
+
+def store_path(device=DEFAULT_DEVICE, root=None):
+    return os.path.join(root or SENSOR_STORE_DIR, device)
+
+
+def wallclock_seconds(timestamp_str, fmt="%Y-%m-%d %H:%M:%S"):
+    """ "2025-09-03 14:37:43" -> naive local seconds used as the store's clock."""
+    return float(calendar.timegm(time.strptime(timestamp_str, fmt)))
+
+
+def local_seconds(t=None):
+    """time.time() -> naive local seconds, keeping the fraction (same clock as wallclock_seconds)."""
+    t = time.time() if t is None else t
+    return t + time.localtime(t).tm_gmtoff
+
+
+def day_name(day):
+    return time.strftime("%Y-%m-%d", time.gmtime(day * DAY))
+
+
+def _day_of(name):
+    return int(calendar.timegm(time.strptime(name, "%Y-%m-%d")) // DAY)
+
+
+# -------------------------
+# Single-writer lock
+# -------------------------
+class WriterLock:
+    """Exclusive, non-blocking lock on `path`, released on close or when the process exits.
+
+    Raises RuntimeError if another process holds it, so a second ingester for
+    the same device fails at startup instead of interleaving its writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a+")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            raise RuntimeError(f"{os.path.dirname(path) or path} is already being written by another process ({path})")
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(f"{os.getpid()}\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            # Closing the handle releases the lock on both platforms
+            self._file.close()
+            self._file = None
+
+
+# -------------------------
+# Block encoding (closed segments)
+# -------------------------
+def _encode_block(records):
+    # Columnar: all timestamps, then all pm25, then all gas -> compresses far better than rows
+    columns = b"".join(np.ascontiguousarray(records[name]).tobytes() for name in RECORD.names)
+    return zlib.compress(columns, 6)
+
+
+def _decode_block(data, count):
+    raw = zlib.decompress(data)
+    records = np.empty(count, dtype=RECORD)
+    offset = 0
+    for name in RECORD.names:
+        dtype = RECORD.fields[name][0]
+        size = dtype.itemsize * count
+        records[name] = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        offset += size
+    return records
+
+
+def read_segment(path):
+    """Every record of a `.segz` file, in block order."""
+    index = np.fromfile(path + ".idx", dtype=BLOCK_INDEX)
+    parts = []
+    with open(path, "rb") as f:
+        for block in index:
+            f.seek(int(block["offset"]))
+            parts.append(_decode_block(f.read(int(block["length"])), int(block["count"])))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD)
+
+
+def compress_segment(raw_path, block_records=BLOCK_RECORDS):
+    """Turn a closed `.seg` file into `.segz` + `.segz.idx` and remove the original.
+
+    Records are sorted by time, since the block index is searched by ts. If
+    the day was already compressed (a late record reopened it), the existing
+    blocks are merged with the raw records rather than replaced.
+    """
+    records = np.fromfile(raw_path, dtype=RECORD, count=os.path.getsize(raw_path) // RECORD.itemsize)
+    base = raw_path[:-len(".seg")]
+    if os.path.exists(base + ".segz.idx") and os.path.exists(base + ".segz"):
+        # np.unique sorts by ts and drops records merged twice (a raw file Windows wouldn't let us remove)
+        records = np.unique(np.concatenate([read_segment(base + ".segz"), records]))
+    else:
+        records = np.sort(records, order="ts", kind="stable")
+    index = np.zeros((len(records) + block_records - 1) // block_records, dtype=BLOCK_INDEX)
+
+    tmp_data, tmp_index = base + ".segz.tmp", base + ".segz.idx.tmp"
+    with open(tmp_data, "wb") as f:
+        for i, start in enumerate(range(0, len(records), block_records)):
+            block = records[start:start + block_records]
+            data = _encode_block(block)
+            index[i] = (block["ts"][0], block["ts"][-1], f.tell(), len(data), len(block))
+            f.write(data)
+    index.tofile(tmp_index)
+
+    # Index first: a reader only trusts .segz once its index exists
+    os.replace(tmp_index, base + ".segz.idx")
+    os.replace(tmp_data, base + ".segz")
+    try:
+        os.remove(raw_path)
+    except PermissionError:
+        # Windows: a reader still has it open. .segz wins in segments(); retried on next compact
+        pass
+    try:
+        os.remove(raw_path + UNORDERED_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+# -------------------------
+# Store
+# -------------------------
+class SensorStore:
+    """Append-only, day-partitioned store for one series of sensor readings.
+
+    One process appends; any number of processes may read. The appender
+    holds `writer.lock` in the series directory (taken up front with
+    `writer=True`, otherwise on the first append), so a second writer for
+    the same device raises RuntimeError. Appends are O(1): a 16-byte write
+    to the active day's segment. When a record for a new day arrives, the
+    previous day's segment is compressed. Range queries only open the
+    segments that overlap the range.
+    """
+
+    def __init__(self, root, block_records=BLOCK_RECORDS, writer=False):
+        self.root = root
+        self.block_records = block_records
+        self._writer_lock = WriterLock(os.path.join(root, WRITER_LOCK)) if writer else None
+        self._file = None
+        self._active_day = None
+        self._last_ts = None      # newest record written to the active segment
+        self._unordered = False   # active segment has the .unordered marker
+        self._index_cache = {}
+        self._lock = threading.Lock()
+
+    # ---- writing ----
+    def append(self, ts, pm25, gas):
+        record = np.array([(ts, pm25, gas)], dtype=RECORD)
+        self.append_many(record)
+
+    def append_many(self, records):
+        """Append a RECORD array, normally sorted by timestamp (a step back is marked, not rejected)."""
+        if len(records) == 0:
+            return
+        with self._lock:
+            days = (records["ts"] // DAY).astype(np.int64)
+            # Split at day boundaries so each run goes to its own segment
+            cuts = np.flatnonzero(np.diff(days)) + 1
+            for run in np.split(records, cuts):
+                day = int(run["ts"][0] // DAY)
+                if day != self._active_day:
+                    self._roll_over(day)
+                ts = run["ts"]
+                if not self._unordered and (
+                    (self._last_ts is not None and ts[0] < self._last_ts) or (np.diff(ts) < 0).any()
+                ):
+                    self._mark_unordered()
+                self._file.write(run.tobytes())
+                self._last_ts = float(ts[-1])
+
+    def _roll_over(self, day):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.makedirs(self.root, exist_ok=True)
+        if self._writer_lock is None:
+            self._writer_lock = WriterLock(os.path.join(self.root, WRITER_LOCK))
+        self._active_day = day
+        path = os.path.join(self.root, day_name(day) + ".seg")
+        self._file = open(path, "ab")
+        self._unordered = os.path.exists(path + UNORDERED_SUFFIX)
+        self._last_ts = None
+        size = os.path.getsize(path)
+        if size >= RECORD.itemsize:
+            # Reopened after a restart: continue the order check from the last record on disk
+            with open(path, "rb") as f:
+                f.seek((size // RECORD.itemsize - 1) * RECORD.itemsize)
+                self._last_ts = float(np.frombuffer(f.read(8), dtype="<f8")[0])
+        self.compact(before_day=day)
+
+    def _mark_unordered(self):
+        open(self._file.name + UNORDERED_SUFFIX, "a").close()
+        self._unordered = True
+
+    def compact(self, before_day=None):
+        """Compress every raw segment older than `before_day` (default: all but the newest)."""
+        raws = sorted(glob.glob(os.path.join(self.root, "*.seg")))
+        if before_day is None and raws:
+            before_day = _day_of(os.path.basename(raws[-1])[:-4])
+        for path in raws:
+            if _day_of(os.path.basename(path)[:-4]) < before_day:
+                compress_segment(path, self.block_records)
+
+    def flush(self, fsync=False):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                if fsync:
+                    os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._active_day = None
+                self._last_ts = None
+            if self._writer_lock is not None:
+                self._writer_lock.close()
+                self._writer_lock = None
+
+    # ---- reading ----
+    def segments(self):
+        """Sorted (day, path, kind) for every segment; kind is "raw" or "compressed"."""
+        found = {}
+        for path in glob.glob(os.path.join(self.root, "*.seg")):
+            found[_day_of(os.path.basename(path)[:-4])] = (path, "raw")
+        for path in glob.glob(os.path.join(self.root, "*.segz")):
+            if os.path.exists(path + ".idx"):
+                found[_day_of(os.path.basename(path)[:-5])] = (path, "compressed")
+        return [(day, path, kind) for day, (path, kind) in sorted(found.items())]
+
+    def query(self, start, end):
+        """All records with start <= ts <= end, as a RECORD array sorted by time."""
+        parts = []
+        for day, path, kind in self.segments():
+            if (day + 1) * DAY <= start or day * DAY > end:
+                continue
+            try:
+                if kind == "raw":
+                    parts.append(self._read_raw(path, start, end))
+                else:
+                    parts.append(self._read_compressed(path, start, end))
+            except FileNotFoundError:
+                # Compacted between listing and reading; the .segz is complete now
+                compressed = path + "z"
+                if kind == "raw" and os.path.exists(compressed + ".idx"):
+                    parts.append(self._read_compressed(compressed, start, end))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD)
+
+    def latest(self):
+        """The newest record, or None for an empty store."""
+        for day, path, kind in reversed(self.segments()):
+            if kind == "raw":
+                with open(path, "rb") as f:
+                    n = os.fstat(f.fileno()).st_size // RECORD.itemsize
+                    if n == 0:
+                        continue
+                    f.seek((n - 1) * RECORD.itemsize)
+                    return np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)[0]
+            index = self._index(path)
+            if len(index):
+                return self._read_blocks(path, index[-1:])[-1]
+        return None
+
+    def _read_raw(self, path, start, end):
+        if os.path.exists(path + UNORDERED_SUFFIX):
+            # The clock stepped back in this segment: no binary search, filter everything
+            records = np.fromfile(path, dtype=RECORD, count=os.path.getsize(path) // RECORD.itemsize)
+            records = records[(records["ts"] >= start) & (records["ts"] <= end)]
+            return np.sort(records, order="ts", kind="stable")
+        with open(path, "rb") as f:
+            n = os.fstat(f.fileno()).st_size // RECORD.itemsize
+            lo = self._bisect_raw(f, n, start, right=False)
+            hi = self._bisect_raw(f, n, end, right=True)
+            if hi <= lo:
+                return np.empty(0, dtype=RECORD)
+            f.seek(lo * RECORD.itemsize)
+            return np.frombuffer(f.read((hi - lo) * RECORD.itemsize), dtype=RECORD).copy()
+
+    @staticmethod
+    def _bisect_raw(f, n, t, right):
+        # Records are fixed-width and time-ordered, so the file itself is the index
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * RECORD.itemsize)
+            ts = np.frombuffer(f.read(8), dtype="<f8")[0]
+            if ts < t or (right and ts == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _index(self, path):
+        # Keyed on the index file's identity: a day re-compressed after a late record gets a new index
+        st = os.stat(path + ".idx")
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._index_cache.get(path)
+        if cached is None or cached[0] != key:
+            cached = (key, np.fromfile(path + ".idx", dtype=BLOCK_INDEX))
+            self._index_cache[path] = cached
+        return cached[1]
+
+    def _read_blocks(self, path, blocks):
+        parts = []
+        with open(path, "rb") as f:
+            for block in blocks:
+                f.seek(int(block["offset"]))
+                parts.append(_decode_block(f.read(int(block["length"])), int(block["count"])))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD)
+
+    def _read_compressed(self, path, start, end):
+        index = self._index(path)
+        # Only blocks whose [first_ts, last_ts] overlaps the range are decompressed
+        lo = np.searchsorted(index["last_ts"], start, side="left")
+        hi = np.searchsorted(index["first_ts"], end, side="right")
+        records = self._read_blocks(path, index[lo:hi])
+        mask = (records["ts"] >= start) & (records["ts"] <= end)
+        return records[mask]
+
+    def stats(self):
+        segments = self.segments()
+        return {
+            "root": self.root,
+            "segments": len(segments),
+            "compressed_segments": sum(1 for _, _, kind in segments if kind == "compressed"),
+            "bytes": sum(os.path.getsize(p) for _, p, _ in segments),
+            "first_day": day_name(segments[0][0]) if segments else None,
+            "last_day": day_name(segments[-1][0]) if segments else None,
+        }
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+# -------------------------
+# Live sensor fan-out
+# -------------------------
+class SensorBroadcaster:
+    """Watches the latest sensor reading once and pushes changes to every subscriber.
+
+    A single task polls `read_latest()` (which must be cheap when nothing
+    changed, e.g. LatestReadingCache) every `poll_interval` seconds while at
+    least one client is connected. Each new reading is serialized once and
+    offered to every subscriber queue. Queues are bounded; a slow client loses
+    its oldest pending readings instead of holding up the others.
+    """
+
+    def __init__(self, read_latest, poll_interval=0.2, client_queue_size=8):
+        self.read_latest = read_latest
+        self.poll_interval = poll_interval
+        self.client_queue_size = client_queue_size
+
+        self._subscribers = set()
+        self._task = None
+        self._last_key = None
+        self.latest = None  # most recent serialized event
+
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.client_queue_size)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def publish(self, payload):
+        event = json.dumps(payload)
+        self.latest = event
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                # Backpressure: keep the newest readings for slow clients
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while self._subscribers:
+            try:
+                key, payload = await loop.run_in_executor(None, self.read_latest)
+                if key is not None and key != self._last_key:
+                    self._last_key = key
+                    self.publish(payload)
+            except Exception as e:
+                key = ("error", str(e))
+                if key != self._last_key:
+                    self._last_key = key
+                    self.publish({"error": str(e)})
+            await asyncio.sleep(self.poll_interval)
+        self._task = None
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "poll_interval_s": self.poll_interval,
+        }
+
+
+async def sse_events(broadcaster, request, heartbeat=15.0):
+    """Server-sent-events body for one client."""
+    queue = broadcaster.subscribe()
+    try:
+        yield "retry: 2000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield f"data: {event}\n\n"
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,196 @@
+import atexit
+import os
+import signal
+import threading
+import time
+
+# -------------------------
+# Buffered CSV writer
+# -------------------------
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def _format_value(value):
+    text = str(value)
+    if any(c in text for c in ',"\r\n'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+class BufferedCSVWriter:
+    """Appends rows to a CSV through one open file handle.
+
+    Rows are buffered in memory and written as a single chunk once
+    `max_rows` are waiting or the oldest has waited `max_delay_s` (a
+    background thread enforces the delay even if no new rows arrive). Only
+    whole rows are written, so readers tailing the file never see a torn
+    line except while a write is in progress.
+
+    fsync policy: "always" after every flush, "interval" at most every
+    `fsync_interval_s`, or "never" (left to the OS). `on_flush(fsync)` is
+    called after each flush, e.g. to flush a SensorStore on the same schedule.
+    """
+
+    def __init__(self, path, header=None, max_rows=64, max_delay_s=1.0,
+                 fsync="interval", fsync_interval_s=10.0, on_flush=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.max_rows = max(1, int(max_rows))
+        self.max_delay = float(max_delay_s)
+        self.fsync = fsync
+        self.fsync_interval = float(fsync_interval_s)
+        self.on_flush = on_flush
+
+        new_file = not os.path.isfile(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._rows = []
+        self._first_buffered = None
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Stats
+        self.rows_written = 0
+        self.flushes = 0
+        self.fsyncs = 0
+        self.max_buffered = 0
+        self._write_total = 0.0
+        self._write_max = 0.0
+        self._fsync_total = 0.0
+        self._fsync_max = 0.0
+
+        if new_file and header:
+            self.writerow(header)
+            self.flush()
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if self.max_delay > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="csv-flusher", daemon=True)
+            self._flusher.start()
+
+    def writerow(self, row):
+        line = ",".join(_format_value(v) for v in row) + "\n"
+        with self._lock:
+            if self._closed:
+                raise ValueError("write to closed BufferedCSVWriter")
+            if not self._rows:
+                self._first_buffered = time.monotonic()
+            self._rows.append(line)
+            self.max_buffered = max(self.max_buffered, len(self._rows))
+            if len(self._rows) >= self.max_rows:
+                self._flush_locked()
+
+    def flush(self, fsync=None):
+        """Write buffered rows now; `fsync=True/False` overrides the policy for this call."""
+        with self._lock:
+            self._flush_locked(fsync)
+
+    def _flush_locked(self, fsync=None):
+        if self._rows:
+            start = time.perf_counter()
+            self._file.write("".join(self._rows))
+            self._file.flush()
+            elapsed = time.perf_counter() - start
+            self._write_total += elapsed
+            self._write_max = max(self._write_max, elapsed)
+            self.rows_written += len(self._rows)
+            self.flushes += 1
+            self._rows = []
+            self._first_buffered = None
+            self._unsynced = True
+
+        if fsync is None:
+            now = time.monotonic()
+            fsync = self.fsync == "always" or (
+                self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+            )
+        if fsync:
+            start = time.perf_counter()
+            os.fsync(self._file.fileno())
+            elapsed = time.perf_counter() - start
+            self._fsync_total += elapsed
+            self._fsync_max = max(self._fsync_max, elapsed)
+            self.fsyncs += 1
+            self._last_fsync = time.monotonic()
+            self._unsynced = False
+
+        if self.on_flush is not None:
+            self.on_flush(fsync)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.max_delay / 2):
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = self._first_buffered is not None and now - self._first_buffered >= self.max_delay
+                # Also sync rows written since the last fsync once the interval is up
+                sync_due = self.fsync == "interval" and self._unsynced and now - self._last_fsync >= self.fsync_interval
+                if due or sync_due:
+                    self._flush_locked()
+
+    def close(self):
+        """Flush (with fsync unless the policy is "never") and close the file."""
+        self._stop.set()
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked(fsync=self.fsync != "never")
+            self._file.close()
+            self._closed = True
+
+    def stats(self):
+        return {
+            "rows_written": self.rows_written,
+            "buffered_rows": len(self._rows),
+            "max_buffered_rows": self.max_buffered,
+            "flushes": self.flushes,
+            "fsyncs": self.fsyncs,
+            "fsync_policy": self.fsync,
+            "mean_write_ms": round(self._write_total / self.flushes * 1000.0, 3) if self.flushes else 0.0,
+            "max_write_ms": round(self._write_max * 1000.0, 3),
+            "mean_fsync_ms": round(self._fsync_total / self.fsyncs * 1000.0, 3) if self.fsyncs else 0.0,
+            "max_fsync_ms": round(self._fsync_max * 1000.0, 3),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------------
+# Shutdown hooks
+# -------------------------
+def close_on_exit(*closeables):
+    """Close `closeables` at interpreter exit and on SIGTERM / SIGHUP / SIGBREAK.
+
+    Ctrl+C (KeyboardInterrupt) is left to the caller's try/finally; the
+    signal handlers turn termination into SystemExit so finally blocks and
+    atexit run too. SIGKILL and power loss can't be caught, which is what
+    the fsync policy is for.
+    """
+    def close_all():
+        for c in closeables:
+            try:
+                c.close()
+            except Exception as e:
+                print(f"Error closing {c}: {e}")
+
+    atexit.register(close_all)
+
+    def handler(signum, frame):
+        raise SystemExit(128 + signum)
+
+    for name in ("SIGTERM", "SIGHUP", "SIGBREAK"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            try:
+                signal.signal(sig, handler)
+            except (ValueError, OSError):
+                pass  # not the main thread, or not supported on this platform
+    return close_all
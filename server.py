@@ -1,72 +1,167 @@
-from fastapi import FastAPI, File, UploadFile
+import time
+
+# Measured from here so /api/ready can report the whole cold start
+STARTUP_BEGIN = time.perf_counter()
+
+from fastapi import Body, FastAPI, File, Form, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-import torch
-from torchvision import transforms, models
-from PIL import Image
-import io
-import torch.nn as nn
-import csv
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Dict, List
+import asyncio
 import os
-import time
+
+import numpy as np
+
+from admission import AdmissionController, ClientRateLimiter, Shed
+from bulk_predict import iter_uploads, stream_predictions
+from inference_batcher import InferenceBatcher
+from inference_executor import InferenceExecutor
+from metrics import REGISTRY, Counter, Gauge, MetricsMiddleware, observe_stage, record_error, stage_timer
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from sensor_aggregates import SummaryCache
+from sensor_history import SensorSeries, downsample, format_timestamps, parse_timestamps
+from sensor_model import DEFAULT_TEMPERATURE_C, fuse_predictions, load_sensor_model
+from sensor_reader import LatestReadingCache
+from sensor_shm import RingReader, ring_path
+from sensor_store import DEFAULT_DEVICE, SensorStore, store_path
+from sensor_stream import SensorBroadcaster, sse_events
+from vision_model import CHECKPOINT_PATH, LOAD_TIMINGS, load_inference_model, warmup_image_bytes
 
 # -------------------------
 # Config / Paths
 # -------------------------
-CHECKPOINT_PATH = r"C:\Users\kartik\Desktop\Envira 2.0\Models\best_resnet18.pth"
-NUM_CLASSES = 6
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 CSV_FILE = "sensor_data.csv"
+SENSOR_CACHE = LatestReadingCache(CSV_FILE)
+SENSOR_RING = RingReader(ring_path())  # published by the ingest process; the CSV is the fallback
+SENSOR_SERIES = SensorSeries(CSV_FILE)
+SENSOR_STORE = SensorStore(store_path())
+SENSOR_AGGREGATES = {}  # device -> SummaryCache of the ingest process's aggregates.json
+HISTORY_MAX_POINTS = 5000
+SENSOR_STREAM_POLL_S = float(os.environ.get("SENSOR_STREAM_POLL_S", "0.2"))
 
-# -------------------------
-# Class Mapping
-# -------------------------
-CLASS_MAP = {
-    0: "Good",
-    1: "Moderate",
-    2: "Severe",
-    3: "Unhealthy for Sensitive Groups",
-    4: "Unhealthy",
-    5: "Very Unhealthy"
-}
+# Micro-batching for /api/predict
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
 
-# -------------------------
-# Image Transform
-# -------------------------
-TRANSFORM = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406],
-                         [0.229, 0.224, 0.225])
-])
+# Executor for decode / preprocessing / inference: "thread" or "process"
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))  # 0 = torch default
+
+# Bulk classification: fixed forward batch size and decode read-ahead
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "32"))
+BULK_PREFETCH = int(os.environ.get("BULK_PREFETCH", "64"))
+
+# Content-addressed prediction cache (0 entries disables it)
+PREDICTION_CACHE_ENTRIES = int(os.environ.get("PREDICTION_CACHE_ENTRIES", "10000"))
+PREDICTION_CACHE_BYTES = int(os.environ.get("PREDICTION_CACHE_BYTES", str(16 * 1024 * 1024)))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "300"))
+
+# Admission control for /api/predict: bounded queue, per-request deadline,
+# per-client token bucket (off by default: it keys on the client address, so
+# users behind one proxy or NAT would share a bucket)
+PREDICT_MAX_QUEUE = int(os.environ.get("PREDICT_MAX_QUEUE", "64"))
+PREDICT_DEADLINE_S = float(os.environ.get("PREDICT_DEADLINE_S", "10"))
+CLIENT_RATE_LIMIT = float(os.environ.get("CLIENT_RATE_LIMIT", "0"))
+CLIENT_RATE_BURST = float(os.environ.get("CLIENT_RATE_BURST", "20"))
+
+# Fused image + sensor AQI: share of the image classifier in the fused distribution
+FUSION_IMAGE_WEIGHT = float(os.environ.get("FUSION_IMAGE_WEIGHT", "0.5"))
+
+# Hot reload: CHECKPOINT_PATH is polled for retrained weights (0 disables)
+MODEL_WATCH_INTERVAL_S = float(os.environ.get("MODEL_WATCH_INTERVAL_S", "5"))
+MODEL_AUTO_ACTIVATE = os.environ.get("MODEL_AUTO_ACTIVATE", "1") == "1"
+MODEL_RESIDENT_VERSIONS = int(os.environ.get("MODEL_RESIDENT_VERSIONS", "2"))
+MODEL_SNAPSHOT_DIR = os.environ.get("MODEL_SNAPSHOT_DIR", "model_versions")
 
 # -------------------------
 # Model Setup
 # -------------------------
-def load_model():
-    model = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-    
-    # Freeze layers (same as training)
-    for idx, child in enumerate(model.children(), start=1):
-        if idx < 7:
-            for param in child.parameters():
-                param.requires_grad = False
-    
-    # Replace final layer
-    num_ftrs = model.fc.in_features
-    model.fc = nn.Sequential(
-        nn.Dropout(0.5),
-        nn.Linear(num_ftrs, NUM_CLASSES)
-    )
-    
-    # Load checkpoint
-    state_dict = torch.load(CHECKPOINT_PATH, map_location=DEVICE)
-    model.load_state_dict(state_dict)
-    model.to(DEVICE)
-    model.eval()
-    
-    return model
+# The model is loaded and warmed up in the background after startup (see
+# warm_up_model), so /api/sensor-data is served immediately.
+# Ready means a model version is active: a failed startup load recovers as soon
+# as the watcher or POST /api/models/load activates one.
+READINESS = {"error": None, "timings_ms": {}}
+
+# Sensor regressor (Models/aqi_model.pkl + scaler.pkl), loaded once alongside the vision model
+SENSOR_MODEL = {"model": None, "error": None}
+
+EXECUTOR = InferenceExecutor(
+    None,
+    mode=INFERENCE_EXECUTOR,
+    workers=INFERENCE_WORKERS,
+    torch_threads=TORCH_THREADS,
+    max_models=MODEL_RESIDENT_VERSIONS,
+)
+
+
+def load_version(path):
+    # Process workers load their own copies, so the server process only needs one in thread mode
+    return load_inference_model(path) if INFERENCE_EXECUTOR == "thread" else None
+
+
+def run_version(entry, items):
+    return EXECUTOR.run_batch(items, model=entry.model, checkpoint_path=entry.path)
+
+
+async def warm_version(entry):
+    # One inference per worker so first requests don't pay lazy init / kernel selection
+    sample = warmup_image_bytes()
+    items = await asyncio.gather(*[EXECUTOR.preprocess(sample) for _ in range(INFERENCE_WORKERS)])
+    await asyncio.gather(*[run_version(entry, [item]) for item in items])
+
+
+MODELS = ModelRegistry(
+    load_version,
+    run_version,
+    warm_fn=warm_version,
+    snapshot_dir=MODEL_SNAPSHOT_DIR,
+    max_resident=MODEL_RESIDENT_VERSIONS,
+)
+
+# Items are (model version, preprocessed image); a batch may mix versions
+BATCHER = InferenceBatcher(
+    MODELS.run_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_in_flight=INFERENCE_WORKERS,
+)
+
+ADMISSION = AdmissionController(
+    max_queue=PREDICT_MAX_QUEUE,
+    deadline_s=PREDICT_DEADLINE_S,
+    workers=INFERENCE_WORKERS,
+    limiter=ClientRateLimiter(CLIENT_RATE_LIMIT, CLIENT_RATE_BURST),
+)
+
+# Keyed on the uploaded bytes + model version; dropped whenever the active version changes
+PREDICTION_CACHE = PredictionCache(
+    max_entries=PREDICTION_CACHE_ENTRIES,
+    max_bytes=PREDICTION_CACHE_BYTES,
+    ttl_seconds=PREDICTION_CACHE_TTL,
+    version_fn=MODELS.active_version,
+)
+
+# Queue / cache state, copied into gauges when /metrics is scraped
+BATCH_QUEUE_DEPTH = REGISTRY.register(Gauge("envira_batch_queue_depth", "Requests waiting for a batch"))
+BATCHES_IN_FLIGHT = REGISTRY.register(Gauge("envira_batches_in_flight", "Batches currently running"))
+CACHE_ENTRIES = REGISTRY.register(Gauge("envira_prediction_cache_entries", "Entries in the prediction cache"))
+ADMISSION_DEPTH = REGISTRY.register(Gauge("envira_admission_queue_depth", "Predict requests admitted and not finished"))
+SHED = REGISTRY.register(Counter("envira_requests_shed_total", "Predict requests turned away", ("reason",)))
 
-MODEL = load_model()
+
+def collect_runtime_metrics():
+    batcher = BATCHER.stats()
+    BATCH_QUEUE_DEPTH.labels().set(batcher["queued"])
+    BATCHES_IN_FLIGHT.labels().set(batcher["in_flight"])
+    CACHE_ENTRIES.labels().set(PREDICTION_CACHE.stats()["entries"])
+    ADMISSION_DEPTH.labels().set(ADMISSION.depth)
+    for reason, count in ADMISSION.shed.items():
+        SHED.labels(reason).set(count)
+
+
+REGISTRY.add_collector(collect_runtime_metrics)
 
 # -------------------------
 # FastAPI Setup
@@ -82,70 +177,433 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts / latency / in-flight per route, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_batcher():
+    await BATCHER.start()
+    READINESS["timings_ms"]["import_to_serving_ms"] = round((time.perf_counter() - STARTUP_BEGIN) * 1000.0, 1)
+    app.state.warmup_task = asyncio.create_task(warm_up_model())
+    app.state.sensor_model_task = asyncio.create_task(load_sensor_model_background())
+
+async def load_sensor_model_background():
+    try:
+        SENSOR_MODEL["model"] = await asyncio.get_running_loop().run_in_executor(None, load_sensor_model)
+        READINESS["timings_ms"]["sensor_model_load_ms"] = SENSOR_MODEL["model"].load_ms
+    except Exception as e:
+        SENSOR_MODEL["error"] = str(e)
+        print(f"Sensor model failed to load: {e}")
+
+async def warm_up_model():
+    timings = READINESS["timings_ms"]
+    try:
+        entry = await MODELS.load(CHECKPOINT_PATH)
+        if INFERENCE_EXECUTOR == "thread":
+            timings.update(LOAD_TIMINGS)
+        timings.update(entry.timings_ms)
+
+        timings["startup_to_ready_ms"] = round((time.perf_counter() - STARTUP_BEGIN) * 1000.0, 1)
+        print(f"Model ready in {timings['startup_to_ready_ms']} ms: {timings}")
+    except Exception as e:
+        READINESS["error"] = str(e)
+        print(f"Model failed to load: {e}")
+
+    # Retrained checkpoints are loaded and swapped in without a restart
+    if MODEL_WATCH_INTERVAL_S > 0:
+        MODELS.watch(CHECKPOINT_PATH, interval=MODEL_WATCH_INTERVAL_S, activate=MODEL_AUTO_ACTIVATE)
+
+def model_ready():
+    return MODELS.active_version() is not None
+
+def shed_response(shed):
+    return JSONResponse(
+        status_code=shed.status_code,
+        content={"error": shed.reason},
+        headers={"Retry-After": str(shed.retry_after)},
+    )
+
+def not_ready_response():
+    return JSONResponse(
+        status_code=503,
+        content={"error": READINESS["error"] or "Model is still loading"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await SENSOR_BROADCASTER.stop()
+    await MODELS.stop()
+    await BATCHER.stop()
+    EXECUTOR.shutdown()
+    SENSOR_RING.close()
+
 # -------------------------
 # Prediction Endpoint
 # -------------------------
+async def classify_upload(request, file):
+    start = time.perf_counter()
+    contents = await file.read()
+    observe_stage("upload_read", time.perf_counter() - start)
+
+    # Chosen once, so the whole request is answered by a single version
+    entry = MODELS.pick()
+
+    # Byte-identical frames skip decode and inference entirely
+    key = PREDICTION_CACHE.key(contents, entry.version)
+    cached = PREDICTION_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    # Bounded: past PREDICT_MAX_QUEUE waiting requests, fail fast instead of queueing
+    async with ADMISSION.admit() as deadline:
+        item = await ADMISSION.run(EXECUTOR.preprocess(contents), request, deadline)
+
+        # Concurrent uploads share one forward pass
+        result = await ADMISSION.run(BATCHER.submit((entry, item)), request, deadline)
+    if "error" not in result:
+        PREDICTION_CACHE.put(key, result)
+    return result
+
 @app.post("/api/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(request: Request, file: UploadFile = File(...)):
+    if not model_ready():
+        return not_ready_response()
     try:
-        contents = await file.read()
-        img = Image.open(io.BytesIO(contents)).convert("RGB")
-        input_tensor = TRANSFORM(img).unsqueeze(0).to(DEVICE)
-        
-        with torch.no_grad():
-            outputs = MODEL(input_tensor)
-            _, predicted = torch.max(outputs, 1)
-            predicted_class = CLASS_MAP[int(predicted.item())]
-            confidence = torch.nn.functional.softmax(outputs, dim=1)[0, predicted.item()].item()
-        
-        return {"predicted_class": predicted_class, "confidence": confidence}
-    
+        ADMISSION.rate_limit(request.client.host if request.client else "unknown")
+        result = await classify_upload(request, file)
+        if "error" in result:
+            record_error("/api/predict")
+        return result
+
+    except Shed as e:
+        return shed_response(e)
     except Exception as e:
+        record_error("/api/predict")
         return {"error": str(e)}
 
+@app.post("/api/predict/bulk")
+async def predict_bulk(request: Request, files: List[UploadFile] = File(...)):
+    if not model_ready():
+        return not_ready_response()
+    try:
+        ADMISSION.rate_limit(request.client.host if request.client else "unknown")
+    except Shed as e:
+        return shed_response(e)
+    # Accepts many images and/or zip/tar archives; results stream back as NDJSON
+    entry = MODELS.pick()
+    return StreamingResponse(
+        stream_predictions(
+            iter_uploads(files),
+            EXECUTOR,
+            batch_size=BULK_BATCH_SIZE,
+            prefetch=BULK_PREFETCH,
+            run_batch=lambda items: MODELS.run_batch([(entry, item) for item in items]),
+        ),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/api/predict/stats")
+async def predict_stats():
+    return {
+        **BATCHER.stats(),
+        "executor": EXECUTOR.stats(),
+        "cache": PREDICTION_CACHE.stats(),
+        "admission": ADMISSION.stats(),
+    }
+
+# -------------------------
+# Fused Image + Sensor AQI
+# -------------------------
+def estimate_sensor_aqi(pm25, temperature):
+    # Supplied values win; otherwise the latest PM2.5 from the CSV and the default temperature
+    source = "supplied"
+    if pm25 is None:
+        reading, _ = latest_sensor_reading()
+        if reading is None:
+            raise ValueError("No PM2.5 supplied and no sensor data available")
+        pm25, source = reading["pm25"], "latest_reading"
+    if temperature is None:
+        temperature = DEFAULT_TEMPERATURE_C
+    with stage_timer("sensor_model"):
+        result = SENSOR_MODEL["model"].predict(pm25, temperature)
+    return {**result, "pm25": pm25, "temperature": temperature, "reading": source}
+
+@app.post("/api/aqi/fused")
+async def predict_fused(
+    request: Request,
+    file: UploadFile = File(...),
+    pm25: float = Form(None),
+    temperature: float = Form(None),
+):
+    if not model_ready():
+        return not_ready_response()
+    if SENSOR_MODEL["model"] is None:
+        if SENSOR_MODEL["error"]:
+            return JSONResponse(status_code=503, content={"error": f"Sensor model unavailable: {SENSOR_MODEL['error']}"})
+        return JSONResponse(status_code=503, content={"error": "Sensor model is still loading"}, headers={"Retry-After": "1"})
+    try:
+        ADMISSION.rate_limit(request.client.host if request.client else "unknown")
+
+        # The tree model (sub-millisecond) runs while the image is decoded and batched
+        loop = asyncio.get_running_loop()
+        image, sensor = await asyncio.gather(
+            classify_upload(request, file),
+            loop.run_in_executor(None, estimate_sensor_aqi, pm25, temperature),
+        )
+        if "error" in image:
+            record_error("/api/aqi/fused")
+            return image
+
+        fused = fuse_predictions(image["probabilities"], sensor["probabilities"], FUSION_IMAGE_WEIGHT)
+        return {
+            **fused,
+            "model_version": image.get("model_version"),
+            "sources": {"image": image, "sensor": sensor},
+            "weights": {"image": FUSION_IMAGE_WEIGHT, "sensor": round(1.0 - FUSION_IMAGE_WEIGHT, 6)},
+        }
+
+    except Shed as e:
+        return shed_response(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        record_error("/api/aqi/fused")
+        return {"error": str(e)}
+
+# -------------------------
+# Model Versions
+# -------------------------
+@app.get("/api/models")
+async def list_models():
+    return MODELS.stats()
+
+@app.post("/api/models/load")
+async def load_model_version(file: str = None, activate: bool = True):
+    # Only checkpoints next to CHECKPOINT_PATH can be loaded; default is CHECKPOINT_PATH itself
+    model_dir = os.path.dirname(os.path.abspath(CHECKPOINT_PATH))
+    path = os.path.join(model_dir, os.path.basename(file)) if file else CHECKPOINT_PATH
+    if not os.path.isfile(path):
+        return JSONResponse(status_code=404, content={"error": f"Checkpoint not found: {os.path.basename(path)}"})
+    try:
+        entry = await MODELS.load(path, activate=activate)
+    except Exception as e:
+        record_error("/api/models/load")
+        return {"error": str(e)}
+    return {**entry.info(), "active": MODELS.active_version()}
+
+@app.post("/api/models/activate")
+async def activate_model_version(version: str):
+    try:
+        MODELS.activate(version)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": str(e.args[0])})
+    return MODELS.stats()
+
+@app.post("/api/models/rollback")
+async def rollback_model_version():
+    try:
+        MODELS.rollback()
+    except KeyError as e:
+        return JSONResponse(status_code=409, content={"error": str(e.args[0])})
+    return MODELS.stats()
+
+@app.post("/api/models/split")
+async def split_model_traffic(weights: Dict[str, float] = Body(...)):
+    # {"<version>": 0.9, "<other version>": 0.1}; {} sends everything to the active version
+    try:
+        MODELS.set_split(weights)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"error": str(e.args[0])})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return MODELS.stats()
+
+@app.delete("/api/models/{version}")
+async def unload_model_version(version: str):
+    try:
+        MODELS.unload(version)
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return MODELS.stats()
+
+# -------------------------
+# Readiness Endpoint
+# -------------------------
+@app.get("/api/ready")
+async def ready():
+    # The sensor model gates readiness only while it is loading; a failed load is
+    # reported but doesn't hold back the image endpoints
+    sensor_loading = SENSOR_MODEL["model"] is None and SENSOR_MODEL["error"] is None
+    ready = model_ready() and not sensor_loading
+    body = {
+        "ready": ready,
+        "error": READINESS["error"] if not model_ready() else "Sensor model is still loading" if sensor_loading else None,
+        "model_version": MODELS.active_version(),
+        "sensor_model": {
+            "loaded": SENSOR_MODEL["model"] is not None,
+            "loading": sensor_loading,
+            "error": SENSOR_MODEL["error"],
+        },
+        "executor": INFERENCE_EXECUTOR,
+        "timings_ms": READINESS["timings_ms"],
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 # -------------------------
 # Sensor Data Endpoint
 # -------------------------
+def sensor_payload(reading):
+    return {
+        "pm25": reading["pm25"],
+        "mq135": reading["mq135"],
+        "timestamp": time.time(),
+        "data_timestamp": reading["data_timestamp"],
+        "source": "real_sensor"
+    }
+
+def latest_sensor_reading():
+    """(reading, etag) from the shared-memory ring, or from the CSV while the ring is missing or empty.
+
+    (None, None) if there is no CSV either.
+    """
+    latest = SENSOR_RING.latest()
+    if latest is not None:
+        record, (epoch, seq) = latest
+        reading = {
+            "data_timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(record["ts"])),
+            "pm25": round(record["pm25"], 1),
+            "mq135": round(record["gas"], 1),
+        }
+        return reading, f'"{epoch:x}-{seq:x}"'
+    if not os.path.isfile(CSV_FILE):
+        return None, None
+    # Only the last row is read, and only when the file has changed
+    return SENSOR_CACHE.get()
+
+def read_latest_for_stream():
+    # (change key, payload) for the broadcaster; the key is the reading's ETag
+    reading, etag = latest_sensor_reading()
+    if etag is None:
+        return "missing", {"error": "Sensor CSV file not found"}
+    if reading is None:
+        return etag, {"error": "No sensor data available"}
+    return etag, sensor_payload(reading)
+
+# One watcher for all dashboards, however many are connected
+SENSOR_BROADCASTER = SensorBroadcaster(read_latest_for_stream, poll_interval=SENSOR_STREAM_POLL_S)
+
 @app.get("/api/sensor-data")
-async def get_sensor_data():
+async def get_sensor_data(request: Request, response: Response):
     try:
-        if not os.path.isfile(CSV_FILE):
+        reading, etag = latest_sensor_reading()
+        if etag is None:
             return {"error": "Sensor CSV file not found"}
         
-        with open(CSV_FILE, 'r') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-        
-        if len(rows) <= 1:
+        if reading is None:
             return {"error": "No sensor data available"}
         
-        # Get last reading
-        last_row = rows[-1]
-        if len(last_row) >= 3:
-            timestamp_str = last_row[0]
-            pm25 = float(last_row[1])
-            mq135 = float(last_row[2])
-            
-            return {
-                "pm25": round(pm25, 1),
-                "mq135": round(mq135, 1),
-                "timestamp": time.time(),
-                "data_timestamp": timestamp_str,
-                "source": "real_sensor"
-            }
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
         
-        return {"error": "Malformed sensor data"}
+        response.headers.update(headers)
+        return sensor_payload(reading)
     
     except Exception as e:
+        record_error("/api/sensor-data")
+        return {"error": str(e)}
+
+@app.get("/api/sensor-data/stream")
+async def stream_sensor_data(request: Request):
+    # Server-sent events: each new reading is pushed as soon as it is written
+    return StreamingResponse(
+        sse_events(SENSOR_BROADCASTER, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/sensor-data/stream/stats")
+async def stream_stats():
+    return SENSOR_BROADCASTER.stats()
+
+@app.get("/api/sensor-data/aggregates")
+async def get_sensor_aggregates(device: str = DEFAULT_DEVICE):
+    # Rolling windows, EWMA, percentiles and the 24 h AQI, maintained at ingestion time
+    if not device or device != os.path.basename(device) or device.startswith("."):
+        return JSONResponse(status_code=400, content={"error": "Invalid device id"})
+    try:
+        cache = SENSOR_AGGREGATES.get(device) or SummaryCache(store_path(device))
+        summary = cache.get()
+        # Only devices that have aggregates get a cache entry
+        SENSOR_AGGREGATES.setdefault(device, cache)
+        return {"device": device, **summary}
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "No aggregates for this device yet"})
+    except Exception as e:
+        record_error("/api/sensor-data/aggregates")
         return {"error": str(e)}
 
+@app.get("/api/sensor-data/history")
+async def get_sensor_history(start: str = None, end: str = None, points: int = 500, mode: str = "minmax"):
+    # start/end use the CSV timestamp format ("2025-09-03 14:37:43"); default is the last 24 h of data
+    if mode not in ("minmax", "lttb"):
+        return JSONResponse(status_code=400, content={"error": "mode must be 'minmax' or 'lttb'"})
+    points = max(1, min(points, HISTORY_MAX_POINTS))
+
+    def query():
+        latest = SENSOR_STORE.latest()
+        if latest is None:
+            # Store not populated yet (see migrate_sensor_csv.py): fall back to the CSV
+            if not os.path.isfile(CSV_FILE):
+                return {"error": "Sensor CSV file not found"}
+            SENSOR_SERIES.refresh()
+            ts, pm25, gas = SENSOR_SERIES.columns()
+            if len(ts) == 0:
+                return {"error": "No sensor data available"}
+            last_ts = int(ts[-1])
+        else:
+            last_ts = int(latest["ts"])
+
+        range_end = int(parse_timestamps([end])[0]) if end else last_ts
+        range_start = int(parse_timestamps([start])[0]) if start else range_end - 24 * 3600
+        if latest is not None:
+            # Only the day segments overlapping the range are read
+            with stage_timer("store_query"):
+                records = SENSOR_STORE.query(range_start, range_end)
+            ts, pm25, gas = records["ts"], records["pm25"].astype(np.float64), records["gas"].astype(np.float64)
+
+        resolved_start, resolved_end = format_timestamps([range_start, range_end])
+        return {
+            "start": resolved_start,
+            "end": resolved_end,
+            "points": points,
+            "mode": mode,
+            "series": downsample(ts, {"pm25": pm25, "mq135": gas}, range_start, range_end, points, mode),
+        }
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, query)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        record_error("/api/sensor-data/history")
+        return {"error": str(e)}
+
+# -------------------------
+# Metrics Endpoint
+# -------------------------
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # -------------------------
 # Server Startup
 # -------------------------
 if __name__ == "__main__":
     import uvicorn
     print("Starting FastAPI server on http://localhost:8000")
-    print("Model loaded successfully!")
-    print("Ready for air quality predictions!")
+    print("Model loads in the background; check http://localhost:8000/api/ready")
     print(f"Sensor data endpoint: http://localhost:8000/api/sensor-data")
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Wifi, WifiOff, RefreshCw, Download, MapPin, Clock, TrendingUp, TrendingDown, Minus, AlertTriangle, CheckCircle, XCircle } from 'lucide-react';
 import './SensorData.css';
 
@@ -17,93 +17,127 @@ const SensorData = () => {
   const [isConnected, setIsConnected] = useState(false);
   const [lastRefresh, setLastRefresh] = useState(new Date());
   const [autoRefresh, setAutoRefresh] = useState(true);
+  const prevAqiRef = useRef(0);
 
-  // Fetch real-time sensor data every 5 seconds
+  // Live sensor data: pushed by the server (SSE), with 5-second polling as fallback
   useEffect(() => {
+    const applySensorData = (data) => {
+      if (data.error) {
+        throw new Error(data.error);
+      }
+      
+      // Check if we have valid sensor data
+      if (data.source === "no_data") {
+        throw new Error("No sensor data available. Please start sensor_data.py to collect real sensor readings.");
+      }
+      
+      // Handle case where PM2.5 sensor might be reading 0.0 but MQ135 is working
+      if (data.pm25 === 0.0 && data.mq135 > 0) {
+        console.warn("PM2.5 sensor reading 0.0 - check sensor connection. Using MQ135 data only.");
+      }
+      
+      // Update sensor readings
+      const newSensorData = {
+        pm25: {
+          value: data.pm25,
+          status: 'online',
+          lastUpdate: new Date()
+        },
+        mq135: {
+          value: data.mq135,
+          status: 'online',
+          lastUpdate: new Date()
+        }
+      };
+      
+      const newAqiData = calculateAQI(data.pm25, data.mq135);
+      
+      // Determine trend
+      const prevAqi = prevAqiRef.current;
+      let trend = 'stable';
+      if (newAqiData.value > prevAqi + 5) trend = 'increasing';
+      else if (newAqiData.value < prevAqi - 5) trend = 'decreasing';
+      
+      prevAqiRef.current = newAqiData.value;
+      setSensorData(newSensorData);
+      setAqiData({ ...newAqiData, trend });
+      setLastRefresh(new Date());
+      setIsConnected(true);
+      
+      // Add to historical data (keep last 50 readings)
+      setHistoricalData(prev => {
+        const newData = [...prev, {
+          timestamp: new Date(),
+          pm25: data.pm25,
+          mq135: data.mq135,
+          aqi: newAqiData.value
+        }];
+        return newData.slice(-50);
+      });
+    };
+
+    const handleFailure = (error) => {
+      console.error('Failed to fetch sensor data:', error);
+      setIsConnected(false);
+      // Set sensors to offline status
+      setSensorData({
+        pm25: { value: 0, status: 'offline', lastUpdate: null },
+        mq135: { value: 0, status: 'offline', lastUpdate: null }
+      });
+    };
+
     const fetchSensorData = async () => {
       try {
         const response = await fetch("http://localhost:8000/api/sensor-data");
         if (!response.ok) {
           throw new Error(`Sensor API not available (${response.status})`);
         }
-        
-        const data = await response.json();
-        
-        if (data.error) {
-          throw new Error(data.error);
-        }
-        
-        // Check if we have valid sensor data
-        if (data.source === "no_data") {
-          throw new Error("No sensor data available. Please start sensor_data.py to collect real sensor readings.");
-        }
-        
-        // Handle case where PM2.5 sensor might be reading 0.0 but MQ135 is working
-        if (data.pm25 === 0.0 && data.mq135 > 0) {
-          console.warn("PM2.5 sensor reading 0.0 - check sensor connection. Using MQ135 data only.");
-        }
-        
-        // Update sensor readings
-        const newSensorData = {
-          pm25: {
-            value: data.pm25,
-            status: 'online',
-            lastUpdate: new Date()
-          },
-          mq135: {
-            value: data.mq135,
-            status: 'online',
-            lastUpdate: new Date()
-          }
-        };
-        
-        const newAqiData = calculateAQI(data.pm25, data.mq135);
-        
-        // Determine trend
-        const prevAqi = aqiData.value;
-        let trend = 'stable';
-        if (newAqiData.value > prevAqi + 5) trend = 'increasing';
-        else if (newAqiData.value < prevAqi - 5) trend = 'decreasing';
-        
-        setSensorData(newSensorData);
-        setAqiData({ ...newAqiData, trend });
-        setLastRefresh(new Date());
-        setIsConnected(true);
-        
-        // Add to historical data (keep last 50 readings)
-        setHistoricalData(prev => {
-          const newData = [...prev, {
-            timestamp: new Date(),
-            pm25: data.pm25,
-            mq135: data.mq135,
-            aqi: newAqiData.value
-          }];
-          return newData.slice(-50);
-        });
-        
+        applySensorData(await response.json());
       } catch (error) {
-        console.error('Failed to fetch sensor data:', error);
-        setIsConnected(false);
-        // Set sensors to offline status
-        setSensorData({
-          pm25: { value: 0, status: 'offline', lastUpdate: null },
-          mq135: { value: 0, status: 'offline', lastUpdate: null }
-        });
+        handleFailure(error);
       }
     };
 
-    // Initial fetch
-    fetchSensorData();
-    
-    // Set up interval for real-time updates every 5 seconds
-    const interval = setInterval(() => {
-      if (autoRefresh) {
-        fetchSensorData();
+    if (!autoRefresh) {
+      fetchSensorData();
+      return undefined;
+    }
+
+    let interval = null;
+    const startPolling = () => {
+      if (interval) return;
+      fetchSensorData();
+      interval = setInterval(fetchSensorData, 5000);
+    };
+    const stopPolling = () => {
+      if (interval) {
+        clearInterval(interval);
+        interval = null;
       }
-    }, 5000);
+    };
 
-    return () => clearInterval(interval);
-  }, [autoRefresh, aqiData.value]);
+    let source = null;
+    if (window.EventSource) {
+      source = new EventSource("http://localhost:8000/api/sensor-data/stream");
+      source.onopen = stopPolling;
+      source.onmessage = (event) => {
+        try {
+          applySensorData(JSON.parse(event.data));
+        } catch (error) {
+          handleFailure(error);
+        }
+      };
+      // EventSource reconnects on its own; poll until it does
+      source.onerror = startPolling;
+    } else {
+      startPolling();
+    }
+
+    return () => {
+      if (source) source.close();
+      stopPolling();
+    };
+  }, [autoRefresh]);
 
 
   // Calculate AQI based on PM2.5 and MQ135 readings
@@ -0,0 +1,158 @@
+import io
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from torchvision import transforms, models
+
+from fast_preprocess import BatchNormalizer, decode_image, resize_array
+from inference_backends import build_backend
+from metrics import stage_timer
+
+# -------------------------
+# Config / Paths
+# -------------------------
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", r"C:\Users\kartik\Desktop\Envira 2.0\Models\best_resnet18.pth")
+NUM_CLASSES = 6
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# "fast" (uint8 + fused normalize, see fast_preprocess.py) or "torchvision" (TRANSFORM)
+PREPROCESS = os.environ.get("PREPROCESS", "fast")
+PREPROCESS_DRAFT = os.environ.get("PREPROCESS_DRAFT", "1") == "1"
+
+# eager | torchscript | onnx | int8-dynamic | int8-static (see inference_backends.py)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", r"C:\Users\kartik\Desktop\Envira 2.0\GAN Data\All_img")
+
+# -------------------------
+# Class Mapping
+# -------------------------
+CLASS_MAP = {
+    0: "Good",
+    1: "Moderate",
+    2: "Severe",
+    3: "Unhealthy for Sensitive Groups",
+    4: "Unhealthy",
+    5: "Very Unhealthy"
+}
+
+# -------------------------
+# Image Transform
+# -------------------------
+TRANSFORM = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406],
+                         [0.229, 0.224, 0.225])
+])
+
+# -------------------------
+# Model Setup
+# -------------------------
+# Filled in by load_model() / load_inference_model() for startup reporting
+LOAD_TIMINGS = {}
+
+
+def load_state_dict(path, map_location=DEVICE):
+    try:
+        # Memory-mapped: tensors are paged in from the file instead of copied up front
+        return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+    except (TypeError, RuntimeError):
+        # torch < 2.1, or a legacy (non-zipfile) checkpoint that can't be mapped
+        return torch.load(path, map_location=map_location)
+
+
+def load_model(checkpoint_path=None):
+    checkpoint_path = checkpoint_path or CHECKPOINT_PATH
+    start = time.perf_counter()
+
+    # Architecture only: every weight comes from our checkpoint, so there is
+    # nothing to gain from downloading the ImageNet weights (and no network needed)
+    model = models.resnet18(weights=None)
+
+    # Freeze layers (same as training)
+    for idx, child in enumerate(model.children(), start=1):
+        if idx < 7:
+            for param in child.parameters():
+                param.requires_grad = False
+
+    # Replace final layer
+    num_ftrs = model.fc.in_features
+    model.fc = nn.Sequential(
+        nn.Dropout(0.5),
+        nn.Linear(num_ftrs, NUM_CLASSES)
+    )
+    built = time.perf_counter()
+
+    # Load checkpoint
+    state_dict = load_state_dict(checkpoint_path)
+    model.load_state_dict(state_dict)
+    model.to(DEVICE)
+    model.eval()
+
+    LOAD_TIMINGS["build_architecture_ms"] = round((built - start) * 1000.0, 1)
+    LOAD_TIMINGS["load_checkpoint_ms"] = round((time.perf_counter() - built) * 1000.0, 1)
+    return model
+
+
+def load_inference_model(checkpoint_path=None):
+    # The fp32 checkpoint wrapped in the configured backend
+    model = load_model(checkpoint_path)
+    start = time.perf_counter()
+    backend = build_backend(INFERENCE_BACKEND, model, calibration_dir=CALIBRATION_DIR)
+    LOAD_TIMINGS["build_backend_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+    return backend
+
+
+def warmup_image_bytes():
+    # A small JPEG that exercises the same decode -> preprocess -> forward path as uploads
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (128, 128, 128)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+# -------------------------
+# Decode / Preprocess / Predict
+# -------------------------
+NORMALIZER = BatchNormalizer()
+
+
+def preprocess_image(contents):
+    if PREPROCESS == "fast":
+        # uint8 HxWx3; normalization happens once per batch in to_batch()
+        with stage_timer("decode"):
+            img = decode_image(contents, draft=PREPROCESS_DRAFT)
+        with stage_timer("transform"):
+            return resize_array(img, draft=PREPROCESS_DRAFT)
+
+    with stage_timer("decode"):
+        img = Image.open(io.BytesIO(contents)).convert("RGB")
+    with stage_timer("transform"):
+        return TRANSFORM(img)
+
+
+def to_batch(items):
+    if isinstance(items[0], np.ndarray):
+        with stage_timer("batch_normalize"):
+            return NORMALIZER(items)
+    return torch.stack(items)
+
+
+def predict_batch(model, items):
+    batch = to_batch(items).to(DEVICE)
+    with torch.no_grad():
+        with stage_timer("forward"):
+            outputs = model(batch)
+        with stage_timer("postprocess"):
+            probs = torch.nn.functional.softmax(outputs, dim=1)
+            confidences, predicted = torch.max(probs, 1)
+            return [
+                {
+                    "predicted_class": CLASS_MAP[int(idx)],
+                    "confidence": float(conf),
+                    "probabilities": {CLASS_MAP[i]: p for i, p in enumerate(row)},
+                }
+                for idx, conf, row in zip(predicted.tolist(), confidences.tolist(), probs.tolist())
+            ]